@@ -1,5 +1,9 @@
 import streamlit as st
 from pages import economic_indicators, stock_market, interest_rates, currency_markets, crypto_markets
+from utils import (
+    date_range_selector, get_date_range, prefetch, timed, get_data_cache, performance_panel,
+    ingestion_panel, write_metrics_file, PERFORMANCE_PANEL, INGESTION_PANEL
+)
 
 # set page config
 st.set_page_config(
@@ -37,10 +41,30 @@ with st.sidebar:
         if st.button(view_name, key=view_name, help=f'View {view_name}', use_container_width=True):
             st.session_state.current_view = view_name
 
+    # date window shared by every chart
+    date_range_selector()
+
 # main content
 st.title('Economic Data Dashboard')
 
 # display content based on selected view
 current_view = st.session_state.current_view
 if current_view in views:
-    views[current_view].show()
\ No newline at end of file
+    with timed('page', current_view):
+        views[current_view].show()
+
+    # load the views next to this one in the navigation while it is being read
+    view_names = list(views)
+    position = view_names.index(current_view)
+    start, end = get_date_range()
+    for step in (1, -1):
+        prefetch(views[view_names[(position + step) % len(view_names)]].datasets(start, end))
+
+# cache stats scan the persistent cache, take them once for the panel and the metrics file
+stats = get_data_cache().stats() if PERFORMANCE_PANEL else None
+with st.sidebar:
+    if PERFORMANCE_PANEL:
+        performance_panel(stats)
+    if INGESTION_PANEL:
+        ingestion_panel()
+write_metrics_file(stats)
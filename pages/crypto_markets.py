@@ -1,40 +1,88 @@
 import streamlit as st
-from utils import load_btc_data, create_figure, get_chart_layout
-import plotly.graph_objects as go
+import pandas as pd
+from utils import (
+    load_bars, load_minute_symbols, bar_resolution, prefetch, create_figure, get_chart_layout,
+    DEFAULT_SYMBOL, MINUTE_SPANS, DEFAULT_MINUTE_SPAN, BAR_LABELS, LIVE_REFRESH_SECONDS
+)
+
+
+def datasets(start, end):
+    '''Bars of every selected symbol, loaded concurrently by prefetch; the page has its
+    own time span, so the shared date range is ignored'''
+    symbols = st.session_state.get('minute_symbols', [DEFAULT_SYMBOL])
+    span = MINUTE_SPANS[st.session_state.get('minute_span', DEFAULT_MINUTE_SPAN)]
+    return {symbol: (load_bars, symbol, span) for symbol in symbols}
 
-def show():
-    st.header('Cryptocurrency Markets')
 
+@st.fragment(run_every=LIVE_REFRESH_SECONDS)
+def live_charts(bars):
+    '''Charts of the selected symbols
+
+    The fragment redraws itself every LIVE_REFRESH_SECONDS without rerunning the rest
+    of the app. Each redraw reads only the bars newer than the shared buffers hold.
+    '''
     try:
-        
-        # BTC data
-        btc_data = load_btc_data()
-
-        # Price chart
-        btc_traces = [
-            {'data':btc_data, 'column':'Close', 'name':'BTC/USD', 'line':{'color':'#FFBA08', 'width':2}}
-        ]
-        fig_btc = create_figure(btc_traces)
-        layout = get_chart_layout('BTC/USD Price')
-        fig_btc.update_layout(layout)
-        st.plotly_chart(fig_btc, use_container_width=True)
+        futures = prefetch(datasets(None, None))
+
+        # Price charts, drawn as each symbol's bars arrive
+        minute_data = {}
+        for symbol, future in futures.items():
+            data = minute_data[symbol] = future.result()
+            price_traces = [
+                {'data':data, 'column':'Close', 'name':symbol, 'line':{'color':'#FFBA08', 'width':2}}
+            ]
+            layout = get_chart_layout(f'{symbol} Price ({bars} bars)')
+            fig_price = create_figure(price_traces, layout)
+            st.plotly_chart(fig_price, use_container_width=True)
         st.markdown("""
         * **Alternative Asset Class**: Cryptocurrencies represent a distinct asset class that historically has shown lower correlation with traditional investments like stocks and bonds, potentially offering portfolio diversification benefits.
-        * **Real-Time Data Pipeline**: This dashboard displays minute-level BTC/USD data that updates with a 2-3 minute lag, demonstrating an automated data pipeline for near real-time market monitoring.
+        * **Real-Time Data Pipeline**: This dashboard displays minute-level data that updates with a 2-3 minute lag, demonstrating an automated data pipeline for near real-time market monitoring.
         """)
 
-        # Volume chart
-        fig_volume = go.Figure()
-        fig_volume.add_trace(go.Bar(x=btc_data.index, y=btc_data['Volume'], name='Volume', marker_color='#FFBA08'))
-        layout = get_chart_layout('BTC/USD Trading Volume')
-        fig_volume.update_layout(layout)
-        st.plotly_chart(fig_volume, use_container_width=True)
+        # Volume charts
+        for symbol, data in minute_data.items():
+            volume_traces = [
+                {'data':data, 'column':'Volume', 'name':'Volume', 'type':'bar', 'marker':{'color':'#FFBA08'}}
+            ]
+            layout = get_chart_layout(f'{symbol} Trading Volume ({bars} bars)')
+            fig_volume = create_figure(volume_traces, layout)
+            st.plotly_chart(fig_volume, use_container_width=True)
 
         # Last 5 values table
-        st.subheader('Latest BTC/USD Data')
-        last_5_data = btc_data.head(5)[['Open', 'High', 'Low', 'Close', 'Volume']]
-        last_5_data = last_5_data.round(2)
-        st.dataframe(last_5_data)
-    
+        if minute_data:
+            st.subheader('Latest Data')
+            last_5_data = pd.concat(
+                {symbol: data.tail(5).iloc[::-1] for symbol, data in minute_data.items()},
+                names=['Symbol']
+            )[['Open', 'High', 'Low', 'Close', 'Volume']]
+            last_5_data = last_5_data.round(2)
+            st.dataframe(last_5_data)
+
+    except Exception as e:
+        st.error(f'Error in Crypto Markets: {e}')
+
+
+def show():
+    st.header('Cryptocurrency Markets')
+
+    try:
+
+        # symbols with minute data
+        available = load_minute_symbols()
+        st.multiselect(
+            'Symbols',
+            available,
+            default=[symbol for symbol in [DEFAULT_SYMBOL] if symbol in available],
+            key='minute_symbols'
+        )
+        span = st.radio(
+            'Time span',
+            list(MINUTE_SPANS),
+            index=list(MINUTE_SPANS).index(DEFAULT_MINUTE_SPAN),
+            horizontal=True,
+            key='minute_span'
+        )
+        live_charts(BAR_LABELS[bar_resolution(MINUTE_SPANS[span])])
+
     except Exception as e:
-        st.error(f'Error in Crypto Markets: {e}')
\ No newline at end of file
+        st.error(f'Error in Crypto Markets: {e}')
@@ -1,25 +1,28 @@
 import streamlit as st
-from utils import create_figure, get_chart_layout, load_data
+from utils import create_figure, get_chart_layout, load_data, prefetch, get_date_range
 
 
+def datasets(start, end):
+    '''Data of every chart on the page, loaded concurrently by prefetch'''
+    return {
+        'dollar_index': (load_data, 'dtwexbgs', ('DTWEXBGS',), start, end),
+        'eurusd': (load_data, 'dexuseu', ('DEXUSEU',), start, end)
+    }
+
 def show():
     st.header('Currency Markets')
+    start, end = get_date_range()
 
     try:
+        data = prefetch(datasets(start, end))
 
         #Dollar Index
-        dollar_query = '''
-        SELECT *
-        FROM dtwexbgs
-        ORDER BY date
-        '''
-        dollar_index = load_data(dollar_query)
+        dollar_index = data['dollar_index'].result()
         dollar_traces = [
             {'data':dollar_index, 'column':'DTWEXBGS', 'name':'Dollar Index', 'line':{'color':'#FFBA08', 'width':2}}
         ]
-        fig_dollar = create_figure(dollar_traces)
         layout = get_chart_layout('Trade Weighted U.S. Dollar Index')
-        fig_dollar.update_layout(layout)
+        fig_dollar = create_figure(dollar_traces, layout)
         st.plotly_chart(fig_dollar, use_container_width=True)
         st.markdown("""
         * **Market Measure**: The Trade Weighted Dollar Index shows the U.S. dollar's strength against major world currencies. A rising index indicates dollar strengthening, falling means weakening.
@@ -29,18 +32,12 @@ def show():
         """)
 
         # EUR/USD
-        eurusd_query = '''
-        SELECT *
-        FROM dexuseu
-        ORDER BY date
-        '''
-        eurusd = load_data(eurusd_query)
+        eurusd = data['eurusd'].result()
         eurusd_traces = [
             {'data':eurusd, 'column':'DEXUSEU', 'name':'EUR/USD', 'line':{'color':'#FFBA08', 'width':2}}
         ]
-        fig_eurusd = create_figure(eurusd_traces)
         layout = get_chart_layout('EUR/USD Exchange Rate')
-        fig_eurusd.update_layout(layout)
+        fig_eurusd = create_figure(eurusd_traces, layout)
         st.plotly_chart(fig_eurusd, use_container_width=True)
         st.markdown("""
         * **Exchange Rate**: EUR/USD shows how many dollars one euro can buy. Higher rate means stronger euro/weaker dollar, lower rate means weaker euro/stronger dollar.
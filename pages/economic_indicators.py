@@ -1,32 +1,37 @@
 import streamlit as st
-from utils import load_data, create_figure, get_chart_layout
+from utils import load_data, load_series, prefetch, create_figure, get_chart_layout, get_date_range
+
+
+def datasets(start, end):
+    '''Data of every chart on the page, loaded concurrently by prefetch'''
+    return {
+        'gdp': (load_series, [('gdpc1', 'gdpc1_us_yoy'), ('gdppot', 'gdppot_us_yoy')], start, end),
+        'unemployment': (load_data, 'unrate', ('UNRATE',), start, end),
+        'cpi': (load_series, [('cpilfesl', 'cpi_core_yoy'), ('cpiaucsl', 'cpi_all_yoy')], start, end),
+        'euro_cpi': (
+            load_series,
+            [('ireland_cpi', 'cpi_ireland_yoy'), ('euro_cpi', 'cpi_euro_yoy'), ('cpiaucsl', 'cpi_all_yoy')],
+            start, end
+        )
+    }
 
 
 def show():
     st.header('Economic Indicators')
+    start, end = get_date_range()
 
     try:
+        data = prefetch(datasets(start, end))
+
         # GDP data
-        gdp_real_query = '''
-        SELECT * 
-        FROM gdpc1
-        ORDER BY date
-        '''
-        gdp_potential_query = '''
-        SELECT * 
-        FROM gdppot
-        ORDER BY date
-        '''
-        gdp_real = load_data(gdp_real_query)
-        gdp_potential = load_data(gdp_potential_query)
+        gdp = data['gdp'].result()
         gdp_traces = [
-            {'data': gdp_real, 'column':'gdpc1_us_yoy', 'name':'Real GDP Growth', 'line': {'color':'#FFBA08', 'width':2}},
-            {'data': gdp_potential, 'column':'gdppot_us_yoy', 'name':'Potential GDP Growth', 'line': {'color':'#00FFF0', 'width':2}},
+            {'data': gdp, 'column':'gdpc1_us_yoy', 'name':'Real GDP Growth', 'line': {'color':'#FFBA08', 'width':2}},
+            {'data': gdp, 'column':'gdppot_us_yoy', 'name':'Potential GDP Growth', 'line': {'color':'#00FFF0', 'width':2}},
         ]
-        fig_gdp = create_figure(gdp_traces)
         layout = get_chart_layout('U.S. Real GDP vs Potential GDP Growth (Year-over-Year)')
         layout.update(yaxis=dict(tickformat='.1%'))
-        fig_gdp.update_layout(layout)
+        fig_gdp = create_figure(gdp_traces, layout)
         st.plotly_chart(fig_gdp, use_container_width=True)
         st.markdown("""
         * **Real vs Potential GDP**: Real GDP represents actual economic output, while Potential GDP indicates the economy's maximum sustainable output. The gap between them helps identify economic cycles and capacity utilization.
@@ -36,19 +41,13 @@ def show():
         """)
 
         # Unemployment Rate
-        unemployment_query = '''
-        SELECT date, UNRATE/100 as UNRATE
-        FROM unrate
-        ORDER BY date
-        '''
-        unemployment = load_data(unemployment_query)
+        unemployment = data['unemployment'].result() / 100
         unemployment_traces = [
             {'data':unemployment, 'column':'UNRATE', 'name':'Unemployment Rate', 'line':{'color':'#FFBA08', 'width':2}}
         ]
-        fig_unemployment = create_figure(unemployment_traces)
         layout = get_chart_layout('U.S. Unemployment Rate')
         layout.update(yaxis=dict(tickformat='.1%'))
-        fig_unemployment.update_layout(layout)
+        fig_unemployment = create_figure(unemployment_traces, layout)
         st.plotly_chart(fig_unemployment, use_container_width=True)
         st.markdown("""
         * **Importance**: The U.S. unemployment rate is a vital economic indicator, reflecting labor market health and overall economic performance. It helps shape policies for sustainable growth.
@@ -58,26 +57,14 @@ def show():
         """)
 
         # US CPI data
-        cpi_core_query = '''
-        SELECT *
-        FROM cpilfesl
-        ORDER BY date
-        '''
-        cpi_all_query = '''
-        SELECT *
-        FROM cpiaucsl
-        ORDER BY date
-        '''
-        cpi_core = load_data(cpi_core_query)
-        cpi_all = load_data(cpi_all_query)
+        cpi = data['cpi'].result()
         cpi_traces = [
-            {'data':cpi_core, 'column':'cpi_core_yoy', 'name':'Core CPI', 'line':{'color':'#FFBA08', 'width':2}},
-            {'data':cpi_all, 'column':'cpi_all_yoy', 'name':'All Items CPI', 'line':{'color':'#00FFF0', 'width':2}}
+            {'data':cpi, 'column':'cpi_core_yoy', 'name':'Core CPI', 'line':{'color':'#FFBA08', 'width':2}},
+            {'data':cpi, 'column':'cpi_all_yoy', 'name':'All Items CPI', 'line':{'color':'#00FFF0', 'width':2}}
         ]
-        fig_cpi = create_figure(cpi_traces)
         layout = get_chart_layout('US Inflation/Consumer Price Index (Year-over-Year Change)')
         layout.update(yaxis=dict(tickformat='.1%'))
-        fig_cpi.update_layout(layout)
+        fig_cpi = create_figure(cpi_traces, layout)
         st.plotly_chart(fig_cpi, use_container_width=True)
         st.markdown("""
         * **Rising Costs of Living**: High inflation, especially post-2020, reduces household purchasing power, prompting families to reallocate budgets toward essentials like food, energy, and housing.
@@ -87,27 +74,15 @@ def show():
         """)
 
         # Ireland and Euro Area CPI Data
-        ireland_cpi_query = '''
-        SELECT *
-        FROM ireland_cpi
-        ORDER BY date
-        '''
-        euro_cpi_query = '''
-        SELECT *
-        FROM euro_cpi
-        ORDER BY date
-        '''
-        ireland_cpi = load_data(ireland_cpi_query)
-        euro_cpi = load_data(euro_cpi_query)
+        euro_cpi = data['euro_cpi'].result()
         euro_cpi_traces = [
-            {'data':ireland_cpi, 'column':'cpi_ireland_yoy', 'name':'Ireland CPI', 'line':{'color':'#00FF00', 'width':2}},
+            {'data':euro_cpi, 'column':'cpi_ireland_yoy', 'name':'Ireland CPI', 'line':{'color':'#00FF00', 'width':2}},
             {'data':euro_cpi, 'column':'cpi_euro_yoy', 'name':'Euro Area CPI', 'line':{'color':'#003399', 'width':2}},
-            {'data':cpi_all, 'column':'api_all_yoy', 'name':'US CPI (All Items)', 'line':{'color':'#00FFF0', 'width':2}}
+            {'data':euro_cpi, 'column':'cpi_all_yoy', 'name':'US CPI (All Items)', 'line':{'color':'#00FFF0', 'width':2}}
         ]
-        fig_euro_cpi = create_figure(euro_cpi_traces)
         layout = get_chart_layout('Ireland vs Euro Area vs. US CPI (Year-over-Year Change)')
         layout.update(yaxis=dict(tickformat='.1%'))
-        fig_euro_cpi.update_layout(layout)
+        fig_euro_cpi = create_figure(euro_cpi_traces, layout)
         st.plotly_chart(fig_euro_cpi, use_container_width=True)
         st.markdown("""
         * **Household Responses to Inflation Pressure**: High inflation since 2020 has led citizens to prioritize essential spending while delaying or reducing discretionary expenses, such as travel or luxury goods.
@@ -1,25 +1,31 @@
 import streamlit as st
-from utils import load_data, create_figure, get_chart_layout
+from utils import load_data, load_series, prefetch, create_figure, get_chart_layout, get_date_range
+
+
+def datasets(start, end):
+    '''Data of every chart on the page, loaded concurrently by prefetch'''
+    return {
+        'fedfunds': (load_data, 'fedfunds', ('FEDFUNDS',), start, end),
+        'treasury': (load_series, [('dgs1', 'DGS1'), ('dgs5', 'DGS5'), ('dgs10', 'DGS10')], start, end)
+    }
+
 
 def show():
     st.header('Interest Rates')
+    start, end = get_date_range()
 
     try:
 
+        data = prefetch(datasets(start, end))
+
         # Fed Funds Rate
-        fedfunds_query = '''
-        SELECT date, FEDFUNDS/100 as FEDFUNDS
-        FROM fedfunds
-        ORDER BY date
-        '''
-        fedfunds = load_data(fedfunds_query)
+        fedfunds = data['fedfunds'].result() / 100
         fedfunds_traces = [
             {'data':fedfunds, 'column':'FEDFUNDS', 'name':'Federal Funds Rate', 'line':{'color':'#FFBA08', 'width':2}}
         ]
-        fig_fedfunds = create_figure(fedfunds_traces)
         layout = get_chart_layout('Federal Funds Rate')
         layout.update(yaxis=dict(tickformat='.1%'))
-        fig_fedfunds.update_layout(layout)
+        fig_fedfunds = create_figure(fedfunds_traces, layout)
         st.plotly_chart(fig_fedfunds, use_container_width=True)
         st.markdown("""
         * **Policy Rate**: The Federal Funds Rate is the key interest rate that banks charge each other for overnight loans, serving as a benchmark for other interest rates in the economy.
@@ -29,33 +35,15 @@ def show():
         """)
 
         # Treasury Yields
-        yields_1y_query = '''
-        SELECT date, DGS1/100 as DGS1
-        FROM dgs1
-        ORDER BY date
-        '''
-        yields_5y_query = '''
-        SELECT date, DGS5/100 as DGS5
-        FROM dgs5
-        ORDER BY date       
-        '''
-        yields_10y_query = '''
-        SELECT date, DGS10/100 as DGS10
-        FROM dgs10
-        ORDER BY date       
-        '''
-        yields_1y = load_data(yields_1y_query)
-        yields_5y = load_data(yields_5y_query)
-        yields_10y = load_data(yields_10y_query)
+        yields = data['treasury'].result() / 100
         treasury_traces = [
-            {'data':yields_1y, 'column':'DGS1', 'name':'1-Year', 'line':{'color':'#FFBA08', 'width':2}},
-            {'data':yields_5y, 'column':'DGS5', 'name':'5-Year', 'line':{'color':'#00FFF0', 'width':2}},
-            {'data':yields_10y, 'column':'DGS10', 'name':'10-Year', 'line':{'color':'#FF00FF', 'width':2}}   
+            {'data':yields, 'column':'DGS1', 'name':'1-Year', 'line':{'color':'#FFBA08', 'width':2}},
+            {'data':yields, 'column':'DGS5', 'name':'5-Year', 'line':{'color':'#00FFF0', 'width':2}},
+            {'data':yields, 'column':'DGS10', 'name':'10-Year', 'line':{'color':'#FF00FF', 'width':2}}   
         ]
-        fig_treasury = create_figure(treasury_traces)
         layout = get_chart_layout('Treasury Yields')
         layout.update(yaxis=dict(tickformat='.1%'))
-        fig_treasury.update_layout(layout)
+        fig_treasury = create_figure(treasury_traces, layout)
         st.plotly_chart(fig_treasury)
         st.markdown("""
         * **Yield Curve**: Treasury yields show interest rates at different maturities. Normally, longer-term yields are higher than shorter-term ones, reflecting greater uncertainty over longer periods.
@@ -1,27 +1,32 @@
 import streamlit as st
-from utils import load_data, create_figure, get_chart_layout
+from utils import load_data, prefetch, create_figure, get_chart_layout, get_date_range
+
+
+def datasets(start, end):
+    '''Data of every chart on the page, loaded concurrently by prefetch'''
+    return {
+        'sp500': (load_data, 'sp500', ('SP500', 'sp500_ma20', 'sp500_ma50', 'sp500_ma200'), start, end),
+        'vix': (load_data, 'vixcls', ('VIXCLS', 'vix_ma20', 'vix_ma50'), start, end)
+    }
+
 
 def show():
     st.header('Stock Market Overview')
+    start, end = get_date_range()
 
     try:
+        data = prefetch(datasets(start, end))
 
         # S&P 500
-        sp500_query = '''
-        SELECT *
-        FROM sp500
-        ORDER BY date
-        '''
-        sp500 = load_data(sp500_query)
+        sp500 = data['sp500'].result()
         sp500_traces = [
             {'data':sp500, 'column':'SP500', 'name':'S&P 500', 'line':{'color':'#FFBA08', 'width':2}},
             {'data':sp500, 'column':'sp500_ma20', 'name':'20-day MA', 'line':{'color':'#00FFF0', 'width':1, 'dash':'dash'}},
             {'data':sp500, 'column':'sp500_ma50', 'name':'50-day MA', 'line':{'color':'#FF00FF', 'width':1, 'dash':'dash'}},
             {'data':sp500, 'column':'sp500_ma200', 'name':'200-day MA', 'line':{'color':'#00FF00', 'width':1, 'dash':'dash'}}          
         ]
-        fig_sp500 = create_figure(sp500_traces)
         layout = get_chart_layout('S&P 500 Index with Moving Averages')
-        fig_sp500.update_layout(layout)
+        fig_sp500 = create_figure(sp500_traces, layout)
         st.plotly_chart(fig_sp500, use_container_width=True)
         st.markdown("""
         * **Technical Overview**: The S&P 500 tracks 500 large U.S. companies, with moving averages (20-day, 50-day, and 200-day) showing trend strength and momentum.
@@ -31,20 +36,14 @@ def show():
         """)
 
         # VIX
-        vix_query = '''
-        SELECT *
-        FROM vixcls
-        ORDER BY date
-        '''
-        vix = load_data(vix_query)
+        vix = data['vix'].result()
         vix_traces = [
-            {'date':vix, 'column':'VIXCLS', 'name':'VIX', 'line':{'color':'#FFBA08', 'width':2}},
-            {'date':vix, 'column':'vix_ma20', 'name':'20-day MA', 'line':{'color':'#00FFF0', 'width':1, 'dash':'dash'}},
-            {'date':vix, 'column':'vix_ma50', 'name':'50-day MA', 'line':{'color':'#FF00FF', 'width':1, 'dash':'dash'}}
+            {'data':vix, 'column':'VIXCLS', 'name':'VIX', 'line':{'color':'#FFBA08', 'width':2}},
+            {'data':vix, 'column':'vix_ma20', 'name':'20-day MA', 'line':{'color':'#00FFF0', 'width':1, 'dash':'dash'}},
+            {'data':vix, 'column':'vix_ma50', 'name':'50-day MA', 'line':{'color':'#FF00FF', 'width':1, 'dash':'dash'}}
         ]
-        fig_vix = create_figure(vix_traces)
         layout = get_chart_layout('VIX Volatility Index')
-        fig_vix.update_layout(layout)
+        fig_vix = create_figure(vix_traces, layout)
         st.plotly_chart(fig_vix, use_container_width=True)
         st.markdown("""
         * **Market Fear Gauge**: The VIX measures expected market volatility, with higher values indicating uncertainty and lower values suggesting stability.
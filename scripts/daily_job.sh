@@ -10,4 +10,7 @@ echo 'Starting daily data collection at $(date)'
 echo 'Running FRED data retrieval...'
 python scripts/fred_data_retrieval.py 
 
+echo 'Archiving old minute data...'
+python scripts/retention.py
+
 echo 'Daily data collection completed at $(date)'
\ No newline at end of file
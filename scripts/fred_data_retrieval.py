@@ -1,179 +1,481 @@
-import os
 import time
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import numpy as np
 import pandas as pd
 from pandas_datareader import data as pdr
-from sqlalchemy import create_engine
+from sqlalchemy import text
 from tqdm import tqdm
+from storage import (
+    EPOCH, create_db_engine, staging_name, series_table_sql, insert_rows, to_day_number,
+    migrate_series_table, setup_versions_table, bump_versions, export_serving_table, record_run,
+    acquire_lock
+)
 
-# Directory to save data
-DATA_DIR = '/Economic-Data-Dashboard/data'
+# Create SQLAlchemy engine
+engine = create_db_engine()
 
-# Ensure data directory exists
-os.makedirs(DATA_DIR, exist_ok=True)
+# Concurrency and rate limit defaults for FRED requests
+DEFAULT_WORKERS = 8
+DEFAULT_RATE = 5.0  # requests per second
+DEFAULT_BURST = 5
 
-# SQLite database path
-DB_PATH = os.path.join(DATA_DIR, 'economics_data.db')
+# Registry of FRED series to fetch. Each entry names the table it is stored in, whether
+# the raw series is kept next to its derived columns, and the transforms to compute.
+# A transform is (kind, periods, column) with kind one of:
+#   change        x / x.shift(periods) - 1
+#   pct_change    same on forward filled values, like DataFrame.pct_change
+#   rolling_mean  mean over the last `periods` observations, NaN if any of them is missing
+METRICS = {
+    # Unemployment Rate
+    'UNRATE': {
+        'name': 'Unemployment Rate',
+        'table': 'unrate',
+        'transforms': [('rolling_mean', 3, 'unrate_ma3'), ('rolling_mean', 12, 'unrate_ma12')],
+    },
+    # Core CPI index
+    'CPILFESL': {
+        'name': 'Core CPI',
+        'table': 'cpilfesl',
+        'keep_raw': False,
+        'transforms': [('change', 12, 'cpi_core_yoy'), ('change', 1, 'cpi_core_mom')],
+    },
+    # All Items CPI index
+    'CPIAUCSL': {
+        'name': 'All Items CPI',
+        'table': 'cpiaucsl',
+        'keep_raw': False,
+        'transforms': [('change', 12, 'cpi_all_yoy'), ('change', 1, 'cpi_all_mom')],
+    },
+    # Ireland CPI
+    'CP0000IEM086NEST': {
+        'name': 'Ireland CPI',
+        'table': 'ireland_cpi',
+        'keep_raw': False,
+        'transforms': [('change', 12, 'cpi_ireland_yoy'), ('change', 1, 'cpi_ireland_mom')],
+    },
+    # Euro Area CPI
+    'CP0000EZ19M086NEST': {
+        'name': 'Euro Area CPI',
+        'table': 'euro_cpi',
+        'keep_raw': False,
+        'transforms': [('change', 12, 'cpi_euro_yoy'), ('change', 1, 'cpi_euro_mom')],
+    },
+    # Real Gross Domestic Product (GDPC1), Billions of Chained 2012 Dollars, QUARTERLY
+    'GDPC1': {
+        'name': 'Real Gross Domestic Product',
+        'table': 'gdpc1',
+        'keep_raw': False,
+        'transforms': [('change', 4, 'gdpc1_us_yoy'), ('change', 1, 'gdpc1_us_qoq')],
+    },
+    # Real Potential Gross Domestic Product (GDPPOT), Billions of Chained 2012 Dollars, QUARTERLY
+    'GDPPOT': {
+        'name': 'Real Potential GDP',
+        'table': 'gdppot',
+        'keep_raw': False,
+        'transforms': [('change', 4, 'gdppot_us_yoy'), ('change', 1, 'gdppot_us_qoq')],
+    },
+    'FEDFUNDS': {'name': 'Fed Funds Rate', 'table': 'fedfunds'},
+    'GFDEGDQ188S': {'name': 'Federal Debt to GDP', 'table': 'gfdegdq188s'},
+    'DGS1': {'name': '1-Year Treasury', 'table': 'dgs1'},
+    'DGS5': {'name': '5-Year Treasury', 'table': 'dgs5'},
+    'DGS10': {'name': '10-Year Treasury', 'table': 'dgs10'},
+    # Trade Weighted U.S. Dollar Index
+    'DTWEXBGS': {
+        'name': 'Trade Weighted U.S. Dollar Index: Broad, Goods',
+        'table': 'dtwexbgs',
+        'transforms': [('rolling_mean', 20, 'dollar_index_ma20'), ('rolling_mean', 50, 'dollar_index_ma50')],
+    },
+    # U.S. / Euro Exchange Rate
+    'DEXUSEU': {
+        'name': 'U.S. / Euro Foreign Exchange Rate',
+        'table': 'dexuseu',
+        'transforms': [('rolling_mean', 20, 'eurusd_ma20'), ('rolling_mean', 50, 'eurusd_ma50')],
+    },
+    # VIX Volatility Index
+    'VIXCLS': {
+        'name': 'VIX Volatility Index',
+        'table': 'vixcls',
+        'transforms': [('rolling_mean', 20, 'vix_ma20'), ('rolling_mean', 50, 'vix_ma50')],
+    },
+    # S&P 500
+    'SP500': {
+        'name': 'S&P 500',
+        'table': 'sp500',
+        'transforms': [
+            ('rolling_mean', 20, 'sp500_ma20'),
+            ('rolling_mean', 50, 'sp500_ma50'),
+            ('rolling_mean', 200, 'sp500_ma200'),
+            ('pct_change', 1, 'sp500_returns_daily'),
+            ('change', 20, 'sp500_returns_monthly'),
+            ('change', 252, 'sp500_returns_yearly'),
+        ],
+    },
+}
+
+
+def lookback_periods(metric_code):
+    '''Number of observations before the watermark that the derived columns depend on'''
+    return max((periods for kind, periods, column in METRICS[metric_code].get('transforms', [])), default=0)
+
+
+class TokenBucket:
+    '''Thread-safe token bucket that limits how fast requests are issued'''
+
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else max(1.0, rate))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        '''Block until a token is available, then consume it'''
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+def setup_database():
+    '''create the watermark table if it doesn't exist and migrate tables to the typed schema'''
+    create_table_sql = text('''
+    CREATE TABLE IF NOT EXISTS fred_watermarks (
+        series TEXT PRIMARY KEY,
+        table_name TEXT,
+        last_date TIMESTAMP,
+        updated_at TIMESTAMP
+    )
+    ''')
+
+    try:
+        with engine.begin() as conn:
+            conn.execute(create_table_sql)
+            setup_versions_table(conn)
+            for metric in METRICS.values():
+                if migrate_series_table(conn, metric['table']):
+                    print(f"Migrated {metric['table']} to the typed schema")
+    except Exception as e:
+        print(f'Error setting up the database: {e}')
+
+
+def get_watermarks():
+    '''Get the latest stored observation date and table of each series'''
+    try:
+        with engine.begin() as conn:
+            rows = conn.execute(text('SELECT series, table_name, last_date FROM fred_watermarks')).fetchall()
+        return {series: (table_name, pd.to_datetime(last_date)) for series, table_name, last_date in rows}
+    except Exception as e:
+        print(f'Error getting watermarks: {e}')
+        return {}
+
+
+def get_lookback_date(table_name, watermark, periods):
+    '''Date of the observation `periods` rows before the watermark, None if the table is too short'''
+    if periods == 0:
+        return watermark
+    try:
+        with engine.begin() as conn:
+            lookback = conn.execute(
+                text(f'SELECT date FROM {table_name} WHERE date < :watermark ORDER BY date DESC LIMIT 1 OFFSET :offset'),
+                {'watermark': (watermark - EPOCH).days, 'offset': periods - 1}
+            ).scalar()
+        return EPOCH + pd.Timedelta(days=lookback) if lookback is not None else None
+    except Exception as e:
+        print(f'Error getting lookback date for {table_name}: {e}')
+        return None
+
+
+def stage_table(name, df, watermark):
+    '''Write the rows to publish into the table's staging copy, invisible to readers'''
+    if watermark is not None:
+        df = df[df.index >= watermark]
+    staging = staging_name(name)
+    with engine.begin() as conn:
+        conn.execute(text(f'DROP TABLE IF EXISTS {staging}'))
+        conn.execute(text(series_table_sql(staging, df.columns)))
+        return insert_rows(conn, staging, 'date', df, to_day_number(df.index))
+
+
+def publish_tables(staged):
+    '''Swap every staged table in and move the watermarks in one short transaction
+
+    Full refreshes rename the staging table over the live one, incremental updates
+    replace the rows from the watermark onwards with the staged rows. Readers see
+    either the previous snapshot or the new one, never a missing table. The data
+    version of every published table is bumped in the same transaction.
+    '''
+    with engine.begin() as conn:
+        for metric_code, name, df, watermark in staged:
+            staging = staging_name(name)
+            if watermark is None:
+                conn.execute(text(f'DROP TABLE IF EXISTS {name}'))
+                conn.execute(text(f'ALTER TABLE {staging} RENAME TO {name}'))
+            else:
+                columns = ', '.join(f'"{column}"' for column in ['date', *df.columns])
+                conn.execute(text(f'DELETE FROM {name} WHERE date >= :watermark'), {'watermark': (watermark - EPOCH).days})
+                conn.execute(text(f'INSERT INTO {name} ({columns}) SELECT {columns} FROM {staging}'))
+                conn.execute(text(f'DROP TABLE {staging}'))
+            update_watermark(conn, metric_code, name, df)
+        bump_versions(conn, [name for metric_code, name, df, watermark in staged])
+
+
+def update_watermark(conn, metric_code, name, df):
+    '''Record the latest observation date stored for a series'''
+    conn.execute(text('''
+        INSERT INTO fred_watermarks (series, table_name, last_date, updated_at)
+        VALUES (:series, :table_name, :last_date, :updated_at)
+        ON CONFLICT(series) DO UPDATE SET
+            table_name = excluded.table_name,
+            last_date = excluded.last_date,
+            updated_at = excluded.updated_at
+    '''), {
+        'series': metric_code,
+        'table_name': name,
+        'last_date': str(df.index.max()),
+        'updated_at': str(pd.Timestamp.now())
+    })
+
+
+def fetch_series(metric_code, min_date, limiter):
+    '''Download a single FRED series, returning the frame and the request time in seconds'''
+    limiter.acquire()
+    start = time.perf_counter()
+    df = pdr.DataReader(metric_code, 'fred', start=min_date)
+    return df, time.perf_counter() - start
+
+
+def forward_fill(values):
+    '''Replace NaNs with the last valid value before them'''
+    idx = np.where(np.isnan(values), 0, np.arange(len(values)))
+    np.maximum.accumulate(idx, out=idx)
+    return values[idx]
 
-# Create SQLAlchemy engine
-engine = create_engine(f'sqlite:///{DB_PATH}')
 
-def fetch_macro(min_date=None):
-    '''Fetch Macro data from FRED (using Pandas datareader)'''
+def compute_transforms(values, transforms):
+    '''Compute every transform of a series in one pass, returning an (n, len(transforms)) array'''
+    n = len(values)
+    out = np.full((n, len(transforms)), np.nan)
+    missing = np.isnan(values)
+
+    # running sums shared by all rolling means: window sum = csum[i + 1] - csum[i + 1 - w]
+    csum = np.concatenate(([0.0], np.cumsum(np.where(missing, 0.0, values))))
+    nan_count = np.concatenate(([0], np.cumsum(missing)))
+    filled = forward_fill(values) if missing.any() else values
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for j, (kind, periods, column) in enumerate(transforms):
+            if periods > n:
+                continue
+            if kind == 'change':
+                out[periods:, j] = values[periods:] / values[:-periods] - 1
+            elif kind == 'pct_change':
+                out[periods:, j] = filled[periods:] / filled[:-periods] - 1
+            elif kind == 'rolling_mean':
+                window_sum = csum[periods:] - csum[:-periods]
+                complete = (nan_count[periods:] - nan_count[:-periods]) == 0
+                out[periods - 1:, j] = np.where(complete, window_sum / periods, np.nan)
+            else:
+                raise ValueError(f'Unknown transform: {kind}')
+    return out
+
+
+def transform_metric(metric_code, df):
+    '''Add derived columns for a series, returning the table name and the frame to store'''
+    metric = METRICS[metric_code]
+    transforms = metric.get('transforms', [])
+    values = df[metric_code].to_numpy(dtype='float64')
+
+    derived = pd.DataFrame(
+        compute_transforms(values, transforms),
+        index=df.index,
+        columns=[column for kind, periods, column in transforms]
+    )
+    if metric.get('keep_raw', True):
+        derived.insert(0, metric_code, values)
+    return metric['table'], derived
+
+
+def fetch_macro(min_date=None, mode='incremental', workers=DEFAULT_WORKERS, rate=DEFAULT_RATE, burst=DEFAULT_BURST):
+    '''Fetch Macro data from FRED (using Pandas datareader)
+
+    In incremental mode each series is fetched from its watermark minus the lookback its
+    derived columns need, and only rows from the watermark onwards are rewritten. Series
+    without a watermark (or with too little stored history) fall back to a full fetch.
+    '''
 
     if min_date is None:
         min_date = "1970-01-01"
     else:
         min_date = pd.to_datetime(min_date)
 
-    # List of metrics to fetch
-    metrics = [
-        ("UNRATE", "Unemployment Rate"),
-        ("CPILFESL", "Core CPI"),
-        ("CPIAUCSL", "All Items CPI"),
-        ("CP0000IEM086NEST", "Ireland CPI"),
-        ("CP0000EZ19M086NEST", "Euro Area CPI"),
-        ("GDPC1", "Real Gross Domestic Product"),
-        ("GDPPOT", "Real Potential GDP"),
-        ("FEDFUNDS", "Fed Funds Rate"),
-        ("GFDEGDQ188S", "Federal Debt to GDP"),
-        ("DGS1", "1-Year Treasury"),
-        ("DGS5", "5-Year Treasury"),
-        ("DGS10", "10-Year Treasury"),
-        ("DTWEXBGS", "Trade Weighted U.S. Dollar Index: Broad, Goods"),
-        ("DEXUSEU", "U.S. / Euro Foreign Exchange Rate"),
-        ("VIXCLS", "VIX Volatility Index"),
-        ("SP500", "S&P 500")
-    ]
+    # start date and watermark per series, watermark None means a full refresh
+    plan = {metric_code: (min_date, None) for metric_code in METRICS}
+    if mode == 'incremental':
+        for metric_code, (table_name, watermark) in get_watermarks().items():
+            if metric_code not in plan:
+                continue
+            start = get_lookback_date(table_name, watermark, lookback_periods(metric_code))
+            if start is not None:
+                plan[metric_code] = (start, watermark)
 
     data = {}
+    timings = {}
+    errors = {}
+    limiter = TokenBucket(rate, burst)
+    run_start = time.time()
+    started = time.perf_counter()
+
+    # requests are issued concurrently, the token bucket keeps them under the rate limit
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        futures = {
+            executor.submit(fetch_series, metric_code, start, limiter): metric_code
+            for metric_code, (start, watermark) in plan.items()
+        }
+        for future in tqdm(as_completed(futures), total=len(futures), desc='Fetching economic data'):
+            metric_code = futures[future]
+            try:
+                df, elapsed = future.result()
+            except Exception as e:
+                tqdm.write(f'[ERROR] Failed to fetch {metric_code}: {e}')
+                errors[metric_code] = str(e)
+                continue
+
+            name, df = transform_metric(metric_code, df)
+            data[name] = (metric_code, df)
+            timings[metric_code] = elapsed
+            tqdm.write(f'[{metric_code}] {len(df)} rows in {elapsed:.2f}s')
 
-    for metric_code, metric_name in tqdm(metrics, desc='Fetching economic data'):
-
-        match metric_code:
-            # Real Gross Domestic Product (GDPC1), Billions of Chained 2012 Dollars, QUARTERLY
-            case 'GDPC1':
-                gdpc1 = pdr.DataReader(metric_code, 'fred', start=min_date)
-                gdpc1['gdpc1_us_yoy'] = gdpc1.GDPC1 / gdpc1.GDPC1.shift(4) - 1
-                gdpc1['gdpc1_us_qoq'] = gdpc1.GDPC1 / gdpc1.GDPC1.shift(1) - 1
-                data['gdpc1'] = gdpc1[['gdpc1_us_yoy', 'gdpc1_us_qoq']]
-                time.sleep(1)  
-
-            # Real Potential Gross Domestic Product (GDPPOT), Billions of Chained 2012 Dollars, QUARTERLY            
-            case 'GDPPOT':
-                gdppot = pdr.DataReader(metric_code, "fred", start=min_date)
-                gdppot['gdppot_us_yoy'] = gdppot.GDPPOT / gdppot.GDPPOT.shift(4) - 1
-                gdppot['gdppot_us_qoq'] = gdppot.GDPPOT / gdppot.GDPPOT.shift(1) - 1
-                data['gdppot'] = gdppot[['gdppot_us_yoy','gdppot_us_qoq']]
-                time.sleep(1)
-
-            # Core CPI index
-            case 'CPILFESL':
-                cpilfesl = pdr.DataReader(metric_code, "fred", start=min_date)
-                cpilfesl['cpi_core_yoy'] = cpilfesl.CPILFESL / cpilfesl.CPILFESL.shift(12) - 1
-                cpilfesl['cpi_core_mom'] = cpilfesl.CPILFESL / cpilfesl.CPILFESL.shift(1) - 1
-                data['cpilfesl'] = cpilfesl[['cpi_core_yoy','cpi_core_mom']]
-                time.sleep(1)
-
-            # All Items CPI index
-            case 'CPIAUCSL':
-                cpiaucsl = pdr.DataReader(metric_code, "fred", start=min_date)
-                cpiaucsl['cpi_all_yoy'] = cpiaucsl.CPIAUCSL / cpiaucsl.CPIAUCSL.shift(12) - 1
-                cpiaucsl['cpi_all_mom'] = cpiaucsl.CPIAUCSL / cpiaucsl.CPIAUCSL.shift(1) - 1
-                data['cpiaucsl'] = cpiaucsl[['cpi_all_yoy','cpi_all_mom']]
-                time.sleep(1)
-
-            # Ireland CPI
-            case 'CP0000IEM086NEST':
-                ireland_cpi = pdr.DataReader(metric_code, "fred", start=min_date)
-                ireland_cpi['cpi_ireland_yoy'] = ireland_cpi.CP0000IEM086NEST / ireland_cpi.CP0000IEM086NEST.shift(12) - 1
-                ireland_cpi['cpi_ireland_mom'] = ireland_cpi.CP0000IEM086NEST / ireland_cpi.CP0000IEM086NEST.shift(1) - 1
-                data['ireland_cpi'] = ireland_cpi[['cpi_ireland_yoy','cpi_ireland_mom']]
-                time.sleep(1)
-
-            # Euro Area CPI
-            case 'CP0000EZ19M086NEST':
-                euro_cpi = pdr.DataReader(metric_code, "fred", start=min_date)
-                euro_cpi['cpi_euro_yoy'] = euro_cpi.CP0000EZ19M086NEST / euro_cpi.CP0000EZ19M086NEST.shift(12) - 1
-                euro_cpi['cpi_euro_mom'] = euro_cpi.CP0000EZ19M086NEST / euro_cpi.CP0000EZ19M086NEST.shift(1) - 1
-                data['euro_cpi'] = euro_cpi[['cpi_euro_yoy','cpi_euro_mom']]
-                time.sleep(1)
-
-            # VIX Volatility Index
-            case 'VIXCLS':
-                vix = pdr.DataReader(metric_code, "fred", start=min_date)
-                # Calculate rolling metrics for VIX
-                vix['vix_ma20'] = vix.VIXCLS.rolling(window=20).mean()
-                vix['vix_ma50'] = vix.VIXCLS.rolling(window=50).mean()
-                data['vixcls'] = vix
-                time.sleep(1)
-
-            # Trade Weighted U.S. Dollar Index
-            case 'DTWEXBGS':
-                dtwexbgs = pdr.DataReader(metric_code, "fred", start=min_date)
-                # Calculate rolling averages for the dollar index
-                dtwexbgs['dollar_index_ma20'] = dtwexbgs.DTWEXBGS.rolling(window=20).mean()
-                dtwexbgs['dollar_index_ma50'] = dtwexbgs.DTWEXBGS.rolling(window=50).mean()
-                data['dtwexbgs'] = dtwexbgs
-                time.sleep(1)
-
-            # U.S. / Euro Exchange Rate
-            case 'DEXUSEU':
-                dexuseu = pdr.DataReader(metric_code, "fred", start=min_date)
-                # Calculate rolling averages for EUR/USD
-                dexuseu['eurusd_ma20'] = dexuseu.DEXUSEU.rolling(window=20).mean()
-                dexuseu['eurusd_ma50'] = dexuseu.DEXUSEU.rolling(window=50).mean()
-                data['dexuseu'] = dexuseu
-                time.sleep(1)
-
-            # Unemployment Rate
-            case 'UNRATE':
-                unrate = pdr.DataReader(metric_code, "fred", start=min_date)
-                # Calculate rolling averages for unemployment
-                unrate['unrate_ma3'] = unrate.UNRATE.rolling(window=3).mean()
-                unrate['unrate_ma12'] = unrate.UNRATE.rolling(window=12).mean()
-                data['unrate'] = unrate
-                time.sleep(1)
-
-            # S&P 500
-            case 'SP500':
-                sp500 = pdr.DataReader(metric_code, "fred", start=min_date)
-                # Calculate rolling averages and returns for S&P 500
-                sp500['sp500_ma20'] = sp500.SP500.rolling(window=20).mean()
-                sp500['sp500_ma50'] = sp500.SP500.rolling(window=50).mean()
-                sp500['sp500_ma200'] = sp500.SP500.rolling(window=200).mean()
-                # calculates the change compared to the immediately previous row (lag=1)
-                sp500['sp500_returns_daily'] = sp500.SP500.pct_change() 
-                sp500['sp500_returns_monthly'] = sp500.SP500 / sp500.SP500.shift(20) - 1
-                sp500['sp500_returns_yearly'] = sp500.SP500 / sp500.SP500.shift(252) - 1
-                data['sp500'] = sp500
-                time.sleep(1)
-
-            # other metrics
-            case _:
-                data[metric_code.lower()] = pdr.DataReader(metric_code, "fred", start=min_date)
-                time.sleep(1)
-
-    for name, df in tqdm(data.items(), desc='Saving data'):
+    total = time.perf_counter() - started
+    print(f'Fetched {len(data)}/{len(METRICS)} series in {total:.2f}s '
+          f'(workers={workers}, rate={rate}/s, sum of request times {sum(timings.values()):.2f}s)')
+
+    steps = {'fetch': total}
+    counts = {'series_fetched': len(data), 'series_failed': len(METRICS) - len(data)}
+    rows_fetched = sum(len(df) for metric_code, df in data.values())
+    rows_written = 0
+
+    staged = []
+    stage_start = time.perf_counter()
+    for name, (metric_code, df) in tqdm(data.items(), desc='Staging data'):
 
         # skip non-DataFrame entries with a warning
         if not isinstance(df, pd.DataFrame):
             print(f'[WARNING] Skipping {name}: Not a DataFrame.')
             continue
 
-        # Save to SQLite with index preserved and named as 'date'
-        df.index.name = 'date'
+        if df.empty:
+            continue
 
         try:
-            # save the DataFrame to the DB
-            df.to_sql(name, engine, if_exists='replace', index=True)
+            watermark = plan[metric_code][1]
+            written = stage_table(name, df, watermark)
+            rows_written += written
+            staged.append((metric_code, name, df, watermark))
+            tqdm.write(f'[{name}] {written} rows staged ({"full" if watermark is None else "incremental"})')
         except Exception as e:
-            print(f'[ERROR] Failed to save {name}:{e}')
+            print(f'[ERROR] Failed to stage {name}:{e}')
+    steps['stage'] = time.perf_counter() - stage_start
+    counts['tables_staged'] = len(staged)
 
+    # partial failures are errors of the run too, the failed series are in the details
+    error = f'Failed to fetch {len(errors)}/{len(METRICS)} series: {", ".join(sorted(errors))}' if errors else None
+    try:
+        if not staged:
+            return
+
+        try:
+            # publish every table at once, readers keep the previous snapshot until the commit
+            swap_start = time.perf_counter()
+            publish_tables(staged)
+            steps['publish'] = time.perf_counter() - swap_start
+            print(f'Published {len(staged)} tables in {steps["publish"] * 1000:.0f} ms')
+        except Exception as e:
+            print(f'[ERROR] Failed to publish staged tables: {e}')
+            error = f'Failed to publish staged tables: {e}'
+            rows_written = 0
+            return
+
+        try:
+            # refresh the serving store from one snapshot of the published tables
+            export_start = time.perf_counter()
+            with engine.begin() as conn:
+                for metric_code, name, df, watermark in staged:
+                    export_serving_table(conn, name)
+            steps['export'] = time.perf_counter() - export_start
+            print(f'Exported {len(staged)} tables to the serving store in {steps["export"] * 1000:.0f} ms')
+        except Exception as e:
+            print(f'[ERROR] Failed to export serving tables, the dashboard reads SQLite until the next run: {e}')
+            error = f'Failed to export serving tables: {e}'
+
+    finally:
+        record_run(
+            engine, 'fred', run_start, steps, counts, rows_fetched, rows_written, error,
+            {'series_seconds': {metric_code: round(elapsed, 3) for metric_code, elapsed in timings.items()}, 'errors': errors}
+        )
 
 
 def main():
-    fetch_macro()
+    parser = argparse.ArgumentParser(
+        description='FRED Data Collection',
+        formatter_class=argparse.RawTextHelpFormatter
+    )
+    parser.add_argument(
+        '--mode',
+        type=str,
+        choices=['incremental', 'full'],
+        default='incremental',
+        metavar='MODE',
+        help='Execution mode:\n'
+            '   incremental - Fetch only observations after each series watermark (default)\n'
+            '   full - Re-download the whole history and replace every table'
+    )
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=DEFAULT_WORKERS,
+        metavar='N',
+        help=f'Number of concurrent FRED requests (default: {DEFAULT_WORKERS}, 1 fetches sequentially)'
+    )
+    parser.add_argument(
+        '--rate',
+        type=float,
+        default=DEFAULT_RATE,
+        metavar='PER_SECOND',
+        help=f'Maximum FRED requests per second (default: {DEFAULT_RATE})'
+    )
+    parser.add_argument(
+        '--burst',
+        type=int,
+        default=DEFAULT_BURST,
+        metavar='N',
+        help=f'Number of requests allowed in a burst before rate limiting kicks in (default: {DEFAULT_BURST})'
+    )
+
+    args = parser.parse_args()
+    if args.rate <= 0:
+        parser.error('--rate must be greater than 0')
+    if args.burst < 1:
+        parser.error('--burst must be at least 1')
+
+    # overlapping runs would share the staging tables and fail each other's publish
+    lock = acquire_lock('fred')
+    if lock is None:
+        print('Another FRED data collection is running - skipping')
+        return
+
+    # set up database
+    setup_database()
+
+    fetch_macro(mode=args.mode, workers=args.workers, rate=args.rate, burst=args.burst)
+    lock.close()
 
 if __name__=='__main__':
     main()
-
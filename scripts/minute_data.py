@@ -0,0 +1,382 @@
+from sqlalchemy import text
+import argparse
+import sys
+import time
+import yfinance as yf
+from datetime import datetime
+import traceback
+import pandas as pd
+from storage import (
+    create_db_engine, table_info, to_epoch_seconds, upsert_rows,
+    setup_versions_table, bump_versions, acquire_lock, record_run
+)
+
+# Create SQLAlchemy engine
+engine = create_db_engine()
+
+# Symbols collected at minute resolution, downloaded together in one request
+SYMBOLS = [
+    'BTC-USD', 'ETH-USD', 'SOL-USD',
+    'EURUSD=X', 'GBPUSD=X', 'JPY=X',
+    'SPY', 'QQQ'
+]
+
+PRICE_COLUMNS = ['Open', 'High', 'Low', 'Close', 'Volume', 'Adj_Close']
+
+# recent bars fetched again on every run, Yahoo may still revise them
+REVISION_WINDOW = pd.Timedelta(minutes=5)
+
+# rollup table -> (table it is aggregated from, bucket size in seconds), each level is
+# built from the one before so a bucket never aggregates more than a few hundred rows
+ROLLUPS = {
+    'minute_bars_5m': ('minute_bars', 5 * 60),
+    'minute_bars_1h': ('minute_bars_5m', 60 * 60),
+    'minute_bars_1d': ('minute_bars_1h', 24 * 60 * 60)
+}
+ROLLUP_COLUMNS = ['Open', 'High', 'Low', 'Close', 'Volume']
+
+
+def get_latest_timestamps(symbols):
+    '''Get the latest timestamp (epoch seconds) of every symbol from the db, None for
+    symbols without data'''
+    try:
+        with engine.begin() as conn:
+            return {
+                symbol: conn.execute(
+                    text('SELECT MAX(ts) FROM minute_bars WHERE symbol = :symbol'), {'symbol': symbol}
+                ).scalar()
+                for symbol in symbols
+            }
+    except Exception as e:
+        print(f'Error getting latest timestamps: {e}')
+        return dict.fromkeys(symbols)
+
+
+def minute_bars_table_sql(table_name='minute_bars'):
+    '''One row per symbol and minute, ts and fetch_timestamp are epoch seconds
+
+    The table is clustered on (symbol, ts), so the bars of one symbol are stored
+    together and reading a symbol's recent window is a single range scan.
+    '''
+    return f'''
+    CREATE TABLE IF NOT EXISTS {table_name} (
+        symbol TEXT NOT NULL,
+        ts INTEGER NOT NULL,
+        Open REAL,
+        High REAL,
+        Low REAL,
+        Close REAL,
+        Volume REAL,
+        Adj_Close REAL,
+        fetch_timestamp INTEGER,
+        PRIMARY KEY (symbol, ts)
+    ) WITHOUT ROWID
+    '''
+
+
+def rollup_table_sql(table_name):
+    '''OHLCV bars of a fixed bucket size, ts is the start of the bucket in epoch seconds'''
+    return f'''
+    CREATE TABLE IF NOT EXISTS {table_name} (
+        symbol TEXT NOT NULL,
+        ts INTEGER NOT NULL,
+        Open REAL,
+        High REAL,
+        Low REAL,
+        Close REAL,
+        Volume REAL,
+        PRIMARY KEY (symbol, ts)
+    ) WITHOUT ROWID
+    '''
+
+
+def update_rollups(conn, ranges):
+    '''Recompute the rollup buckets overlapping the written bars, within the caller's
+    transaction
+
+    `ranges` maps each symbol to the (first, last) epoch seconds of the bars written.
+    Only the buckets covering that range are aggregated again, level by level. Open and
+    Close come from the first and last source bar of each bucket.
+    '''
+    if not ranges:
+        return
+    for table_name, (source, size) in ROLLUPS.items():
+        params = [
+            (symbol, first // size * size, last // size * size + size)
+            for symbol, (first, last) in ranges.items()
+        ]
+        conn.exec_driver_sql(f'''
+            INSERT INTO {table_name} (symbol, ts, {', '.join(ROLLUP_COLUMNS)})
+            SELECT
+                b.symbol, b.bucket,
+                (SELECT Open FROM {source} WHERE symbol = b.symbol AND ts = b.first_ts),
+                b.high, b.low,
+                (SELECT Close FROM {source} WHERE symbol = b.symbol AND ts = b.last_ts),
+                b.volume
+            FROM (
+                SELECT
+                    symbol, ts / {size} * {size} AS bucket, MIN(ts) AS first_ts, MAX(ts) AS last_ts,
+                    MAX(High) AS high, MIN(Low) AS low, SUM(Volume) AS volume
+                FROM {source}
+                WHERE symbol = ? AND ts >= ? AND ts < ?
+                GROUP BY bucket
+            ) b
+            WHERE true
+            ON CONFLICT(symbol, ts) DO UPDATE SET
+                {', '.join(f'{column} = excluded.{column}' for column in ROLLUP_COLUMNS)}
+        ''', params)
+
+
+def setup_rollups(conn):
+    '''Create missing rollup tables and build them from the minute bars already stored'''
+    missing = [table_name for table_name in ROLLUPS if not table_info(conn, table_name)]
+    for table_name in ROLLUPS:
+        conn.exec_driver_sql(rollup_table_sql(table_name))
+    if not missing:
+        return False
+    ranges = {
+        symbol: (first, last)
+        for symbol, first, last in conn.exec_driver_sql('SELECT symbol, MIN(ts), MAX(ts) FROM minute_bars GROUP BY symbol')
+    }
+    update_rollups(conn, ranges)
+    bump_versions(conn, list(ROLLUPS))
+    return True
+
+
+def migrate_btc_minute(conn):
+    '''Move the bars of the former single-symbol btc_minute table into minute_bars'''
+    info = table_info(conn, 'btc_minute')
+    if not info:
+        return False
+    # older btc_minute tables stored TIMESTAMP text instead of epoch seconds
+    if info['Datetime'][0] == 'INTEGER':
+        ts, fetched = 'Datetime', 'fetch_timestamp'
+    else:
+        ts, fetched = "CAST(strftime('%s', Datetime) AS INTEGER)", "CAST(strftime('%s', fetch_timestamp) AS INTEGER)"
+    conn.exec_driver_sql(f'''
+        INSERT OR IGNORE INTO minute_bars (symbol, ts, {', '.join(PRICE_COLUMNS)}, fetch_timestamp)
+        SELECT 'BTC-USD', {ts}, {', '.join(PRICE_COLUMNS)}, {fetched} FROM btc_minute
+    ''')
+    conn.exec_driver_sql('DROP TABLE btc_minute')
+    bump_versions(conn, ['minute_bars'])
+    return True
+
+
+def setup_database():
+    '''create the database table if it doesn't exist'''
+    try:
+        with engine.begin() as conn: # ensure transaction are committed or rolled back automatically
+            conn.execute(text(minute_bars_table_sql()))
+            setup_versions_table(conn)
+            if migrate_btc_minute(conn):
+                print('Migrated btc_minute into minute_bars')
+            if setup_rollups(conn):
+                print(f'Built rollup tables {", ".join(ROLLUPS)}')
+    except Exception as e:
+        print(f'Error setting up the database: {e}')
+
+
+
+def to_long_format(df, symbols):
+    '''Reshape yfinance's wide (Price, Ticker) columns into one row per symbol and minute'''
+    if df.columns.nlevels == 1:
+        df = pd.concat({symbols[0]: df}, axis=1, names=['Ticker', 'Price']).swaplevel(axis=1)
+    long_df = df.stack(level='Ticker', future_stack=True)
+    long_df.index.names = ['ts', 'symbol']
+    long_df = long_df.rename(columns={'Adj Close': 'Adj_Close'}).reindex(columns=PRICE_COLUMNS)
+    # symbols that don't trade in a given minute (e.g. equities outside market hours) come back as NaN
+    return long_df.dropna(how='all', subset=['Open', 'High', 'Low', 'Close'])
+
+
+def get_minute_data(symbols=SYMBOLS):
+    '''Get minute-level data of all symbols in one batched download'''
+    steps, counts = {}, {}
+    error = None
+    run_start = time.time()
+    try:
+        # get the latest timestamp of every symbol
+        latest_timestamps = get_latest_timestamps(symbols)
+
+        # download data using yf.download with 1d period and 1m interval
+        download_start = time.perf_counter()
+        df = yf.download(
+            tickers=symbols,
+            interval='1m',
+            period='1d',
+            group_by='column',
+            progress=False
+        )
+        steps['download'] = time.perf_counter() - download_start
+
+        if df.empty:
+            print('No data received.')
+            return None
+
+        new_df = to_long_format(df, symbols)
+        symbol = new_df.index.get_level_values('symbol').to_numpy(dtype=object)
+        ts = to_epoch_seconds(new_df.index.get_level_values('ts'))
+
+        # keep new bars plus the most recent ones, which may have been revised
+        revision_seconds = REVISION_WINDOW // pd.Timedelta(seconds=1)
+        cutoff = pd.Series(latest_timestamps, dtype='float64').fillna(-float('inf')) - revision_seconds
+        keep = ts > cutoff.reindex(symbol).to_numpy()
+        new_df, ts, symbol = new_df[keep], ts[keep], symbol[keep]
+        counts['bars_received'] = len(new_df)
+        if new_df.empty:
+            print('No data received.')
+            return None
+        print(f'New data shape after filtering: {new_df.shape}')
+
+        new_df = new_df.reset_index(drop=True)
+        new_df['fetch_timestamp'] = int(datetime.now().timestamp())
+
+        # upsert in one transaction, bars that didn't change are left alone
+        try:
+            start = time.perf_counter()
+            with engine.begin() as conn:
+                inserted, updated, unchanged = upsert_rows(
+                    conn, 'minute_bars', ('symbol', 'ts'), new_df,
+                    (symbol, ts), PRICE_COLUMNS
+                )
+                if inserted or updated:
+                    written = pd.DataFrame({'symbol': symbol, 'ts': ts}).groupby('symbol')['ts'].agg(['min', 'max'])
+                    update_rollups(conn, {s: (int(row['min']), int(row['max'])) for s, row in written.iterrows()})
+                    bump_versions(conn, ['minute_bars', *ROLLUPS])
+            steps['save'] = time.perf_counter() - start
+            counts.update(bars_inserted=inserted, bars_updated=updated, bars_unchanged=unchanged)
+            print(
+                f'Saved {len(new_df)} bars of {len(set(symbol))} symbols in {steps["save"] * 1000:.0f} ms: '
+                f'{inserted} inserted, {updated} updated, {unchanged} unchanged'
+            )
+
+        except Exception as e:
+            print(f'Error saving to database: {e}')
+            error = f'Error saving to database: {e}'
+            return None
+
+        return new_df
+
+    except Exception as e:
+        print(f'Error fetching data: {e}')
+        print(f'Traceback: {traceback.format_exc()}')
+        error = f'Error fetching data: {e}'
+        return None
+
+    finally:
+        record_run(
+            engine, 'minute_data', run_start, steps, counts, counts.get('bars_received', 0),
+            counts.get('bars_inserted', 0) + counts.get('bars_updated', 0), error
+        )
+
+
+def next_boundary(interval_seconds, offset_seconds):
+    '''Next wall-clock multiple of the interval (plus offset), as a unix timestamp'''
+    now = time.time() - offset_seconds
+    return now // interval_seconds * interval_seconds + interval_seconds + offset_seconds
+
+
+def run_daemon(symbols=SYMBOLS, interval_seconds=60, offset_seconds=5):
+    '''Fetch minute data on every wall-clock interval boundary
+
+    Cycles are scheduled from the clock rather than by sleeping a fixed interval, so
+    fetch time never accumulates into drift. A cycle that overruns the next boundary
+    skips it instead of queueing up. The offset gives Yahoo a few seconds to close the
+    bar of the minute that just ended.
+    '''
+    lock = acquire_lock('minute_bars')
+    if lock is None:
+        print('Another minute data collector is running - exiting')
+        sys.exit(1)
+
+    print(f'Minute data daemon started for {len(symbols)} symbols, interval {interval_seconds}s, offset {offset_seconds}s')
+    try:
+        scheduled = next_boundary(interval_seconds, offset_seconds)
+        while True:
+            time.sleep(max(0, scheduled - time.time()))
+            started = time.time()
+            try:
+                new_df = get_minute_data(symbols)
+            except Exception as e:
+                print(f'Error fetching data: {e}')
+                new_df = None
+            finished = time.time()
+
+            rows = 0 if new_df is None else len(new_df)
+            print(
+                f'{datetime.fromtimestamp(scheduled):%Y-%m-%d %H:%M:%S} cycle: {rows} bars fetched, '
+                f'{(finished - started) * 1000:.0f} ms, started {(started - scheduled) * 1000:.0f} ms late',
+                flush=True
+            )
+
+            following = next_boundary(interval_seconds, offset_seconds)
+            skipped = round((following - scheduled) / interval_seconds) - 1
+            if skipped > 0:
+                print(f'Cycle overran, skipped {skipped} boundaries')
+            scheduled = following
+    except KeyboardInterrupt:
+        print('Stopping data collection')
+    finally:
+        lock.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Minute Data Collection',
+        formatter_class=argparse.RawTextHelpFormatter
+    )
+
+    mode_choices = ['daemon', 'continuous', 'once']
+
+    parser.add_argument(
+        '--mode',
+        type=str,
+        choices=mode_choices,
+        default='once',
+        metavar='MODE',
+        help='Execution mode:\n'
+            '   daemon - Keep running and fetch data on every wall-clock interval boundary\n'
+            '   continuous - Same as daemon\n'
+            '   once - Single fetch and exit (default)'
+    )
+    parser.add_argument(
+        '--interval',
+        type=int,
+        default='60',
+        metavar='SECONDS',
+        help='Interval in seconds between fetches in daemon mode (default: 60)'
+    )
+    parser.add_argument(
+        '--offset',
+        type=int,
+        default=5,
+        metavar='SECONDS',
+        help='Seconds after each interval boundary to fetch in daemon mode (default: 5)'
+    )
+    parser.add_argument(
+        '--symbols',
+        type=str,
+        nargs='+',
+        default=SYMBOLS,
+        metavar='SYMBOL',
+        help=f'Yahoo Finance symbols to collect (default: {" ".join(SYMBOLS)})'
+    )
+
+    args = parser.parse_args()
+
+    # set up database
+    setup_database()
+
+    # execute based on mode
+    if args.mode in ('daemon', 'continuous'):
+        run_daemon(args.symbols, args.interval, args.offset)
+    else:
+        lock = acquire_lock('minute_bars')
+        if lock is None:
+            print('Another minute data collector is running - skipping')
+            return
+        get_minute_data(args.symbols)
+        lock.close()
+
+
+if __name__=='__main__':
+    main()
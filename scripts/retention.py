@@ -0,0 +1,119 @@
+import argparse
+import os
+import time
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from storage import ARCHIVE_DIR, create_db_engine, bump_versions, acquire_lock, record_run, replacing
+
+# Create SQLAlchemy engine
+engine = create_db_engine()
+
+# Minute bars younger than this stay in SQLite, older ones move to the archive
+DEFAULT_HOT_DAYS = 30
+
+MINUTE_BAR_ARCHIVE = os.path.join(ARCHIVE_DIR, 'minute_bars')
+DAY_SECONDS = 24 * 60 * 60
+
+
+def partition_path(day):
+    '''Parquet file holding the minute bars of one UTC day, all symbols'''
+    return os.path.join(MINUTE_BAR_ARCHIVE, f'date={day:%Y-%m-%d}', 'bars.parquet')
+
+
+def write_partition(day, df):
+    '''Write one day of bars, merged with the bars already archived for that day
+
+    Rows of `df` win over archived rows with the same key.
+    '''
+    path = partition_path(day)
+    if os.path.exists(path):
+        # read as a plain file, read_table would add the hive `date` column of the path
+        archived = pq.ParquetFile(path).read().to_pandas()
+        df = pd.concat([archived.drop(columns='date', errors='ignore'), df])
+        df = df.drop_duplicates(['symbol', 'ts'], keep='last')
+    df = df.sort_values(['symbol', 'ts'])
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    with replacing(path) as temporary:
+        pq.write_table(table, temporary, compression='zstd')
+    return len(df)
+
+
+def first_day(symbols, since):
+    '''Start of the first UTC day at or after `since` with minute bars, None if there is none'''
+    with engine.begin() as conn:
+        firsts = [
+            conn.exec_driver_sql('SELECT MIN(ts) FROM minute_bars WHERE symbol = ? AND ts >= ?', (symbol, since)).scalar()
+            for symbol in symbols
+        ]
+    firsts = [first for first in firsts if first is not None]
+    return min(firsts) // DAY_SECONDS * DAY_SECONDS if firsts else None
+
+
+def archive_minute_bars(hot_days=DEFAULT_HOT_DAYS):
+    '''Move minute bars older than `hot_days` (rounded down to a UTC day) to Parquet
+
+    Each old day is written to its partition before its rows are deleted, so an
+    interrupted run loses nothing and the next run picks up where it stopped. Rollup
+    tables are small and keep their full history in SQLite.
+    '''
+    run_start = time.time()
+    start = time.perf_counter()
+    cutoff = (int(time.time()) // DAY_SECONDS - hot_days) * DAY_SECONDS
+    archived = 0
+    error = None
+    try:
+        with engine.begin() as conn:
+            symbols = [row[0] for row in conn.exec_driver_sql('SELECT DISTINCT symbol FROM minute_bars')]
+
+        # symbol IN (...) keeps every lookup on the (symbol, ts) primary key
+        where = f'symbol IN ({", ".join("?" for _ in symbols)}) AND ts >= ? AND ts < ?'
+        day_start = first_day(symbols, 0)
+        while day_start is not None and day_start < cutoff:
+            params = (*symbols, day_start, day_start + DAY_SECONDS)
+            with engine.begin() as conn:
+                df = pd.read_sql_query(f'SELECT * FROM minute_bars WHERE {where}', conn, params=params)
+                day = pd.Timestamp(day_start, unit='s')
+                write_partition(day, df)
+                conn.exec_driver_sql(f'DELETE FROM minute_bars WHERE {where}', params)
+                bump_versions(conn, ['minute_bars'])
+            archived += len(df)
+            print(f'Archived {len(df)} bars of {day:%Y-%m-%d}')
+            day_start = first_day(symbols, day_start + DAY_SECONDS)
+
+    except Exception as e:
+        print(f'[ERROR] Failed to archive minute bars: {e}')
+        error = f'Failed to archive minute bars: {e}'
+
+    finally:
+        elapsed = time.perf_counter() - start
+        print(f'Archived {archived} minute bars in {elapsed * 1000:.0f} ms')
+        record_run(engine, 'retention', run_start, {'archive': elapsed}, {'bars_archived': archived}, archived, archived, error)
+    return archived
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Minute Data Retention',
+        formatter_class=argparse.RawTextHelpFormatter
+    )
+    parser.add_argument(
+        '--hot-days',
+        type=int,
+        default=DEFAULT_HOT_DAYS,
+        metavar='DAYS',
+        help=f'Days of minute bars kept in SQLite, older bars are archived to Parquet (default: {DEFAULT_HOT_DAYS})'
+    )
+
+    args = parser.parse_args()
+
+    lock = acquire_lock('retention')
+    if lock is None:
+        print('Another retention job is running - skipping')
+        return
+    archive_minute_bars(args.hot_days)
+    lock.close()
+
+
+if __name__=='__main__':
+    main()
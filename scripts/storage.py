@@ -0,0 +1,373 @@
+import os
+import json
+import time
+import fcntl
+from contextlib import contextmanager
+import pandas as pd
+import pyarrow as pa
+from sqlalchemy import create_engine, event
+
+# Directory to save data
+DATA_DIR = '/Economic-Data-Dashboard/data'
+
+# Ensure data directory exists
+os.makedirs(DATA_DIR, exist_ok=True)
+
+# SQLite database path
+DB_PATH = os.path.join(DATA_DIR, 'economics_data.db')
+
+# Arrow IPC copies of the FRED tables the dashboard memory-maps instead of querying SQLite
+SERVING_DIR = os.path.join(DATA_DIR, 'serving')
+
+# Date-partitioned Parquet files of data moved out of SQLite by the retention job
+ARCHIVE_DIR = os.path.join(DATA_DIR, 'archive')
+
+# Prometheus text files with the step timings of each job's last run, one file per job
+METRICS_DIR = os.path.join(DATA_DIR, 'metrics')
+
+# Days of run records kept per job in the ingestion_runs table
+RUN_HISTORY_DAYS = 90
+
+# Suffix of the tables ingestion writes into before swapping them in
+STAGING_SUFFIX = '__staging'
+
+# How long a writer waits for a lock before giving up (milliseconds)
+BUSY_TIMEOUT_MS = 5000
+
+# Dates are stored as integers counted from this epoch: days for FRED series,
+# seconds for minute bars
+EPOCH = pd.Timestamp('1970-01-01')
+
+
+def create_db_engine(db_path=DB_PATH):
+    '''Create a SQLAlchemy engine for ingestion
+
+    The database runs in WAL mode so the dashboard keeps reading the last committed
+    snapshot while a job writes. pysqlite's own transaction handling is disabled and
+    BEGIN is emitted explicitly, so DDL such as table swaps is part of the transaction
+    instead of being committed statement by statement.
+    '''
+    engine = create_engine(f'sqlite:///{db_path}')
+
+    @event.listens_for(engine, 'connect')
+    def configure_connection(dbapi_connection, connection_record):
+        dbapi_connection.isolation_level = None
+        cursor = dbapi_connection.cursor()
+        cursor.execute('PRAGMA journal_mode = WAL')
+        cursor.execute(f'PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}')
+        cursor.close()
+
+    @event.listens_for(engine, 'begin')
+    def begin_transaction(conn):
+        conn.exec_driver_sql('BEGIN')
+
+    return engine
+
+
+def staging_name(table_name):
+    return f'{table_name}{STAGING_SUFFIX}'
+
+
+def quote(column):
+    return f'"{column}"'
+
+
+def to_day_number(index):
+    '''Days since 1970-01-01 of a DatetimeIndex, the key FRED tables are stored under'''
+    if index.tz is not None:
+        index = index.tz_convert('UTC').tz_localize(None)
+    return ((index - EPOCH) // pd.Timedelta(days=1)).to_numpy(dtype='int64')
+
+
+def to_epoch_seconds(index):
+    '''Seconds since 1970-01-01 UTC of a DatetimeIndex, the key of minute bar tables'''
+    if index.tz is not None:
+        index = index.tz_convert('UTC').tz_localize(None)
+    return ((index - EPOCH) // pd.Timedelta(seconds=1)).to_numpy(dtype='int64')
+
+
+def series_table_sql(table_name, columns):
+    '''DDL of a FRED table: the day number is the rowid, so lookups and ORDER BY date use
+    the table's own b-tree and no separate index is needed'''
+    value_columns = ''.join(f',\n        {quote(column)} REAL' for column in columns)
+    return f'''
+    CREATE TABLE {table_name} (
+        date INTEGER PRIMARY KEY{value_columns}
+    )
+    '''
+
+
+def key_columns(key, keys):
+    '''Normalize a key column name and its values, or tuples of both for composite keys'''
+    if isinstance(key, str):
+        return [key], [keys]
+    return list(key), list(keys)
+
+
+def insert_rows(conn, table_name, key, df, keys):
+    '''Bulk insert a frame with executemany, `keys` being the primary key values
+
+    For a composite primary key pass a tuple of column names as `key` and a tuple of
+    arrays as `keys`.
+    '''
+    key, keys = key_columns(key, keys)
+    columns = [*key, *df.columns]
+    placeholders = ', '.join('?' for _ in columns)
+    rows = list(zip(*(values.tolist() for values in keys), *(df[column].tolist() for column in df.columns)))
+    conn.exec_driver_sql(
+        f'INSERT OR REPLACE INTO {table_name} ({", ".join(map(quote, columns))}) VALUES ({placeholders})',
+        rows
+    )
+    return len(rows)
+
+
+def upsert_rows(conn, table_name, key, df, keys, compare_columns=None):
+    '''Bulk insert or update a frame through a temp table, within the caller's transaction
+
+    Existing rows are only rewritten when one of `compare_columns` (default: all columns)
+    differs, so re-sending overlapping rows is cheap. `key` and `keys` are as for
+    insert_rows. Returns (inserted, updated, unchanged).
+    '''
+    key_names = key_columns(key, keys)[0]
+    columns = [*key_names, *df.columns]
+    compare_columns = list(df.columns) if compare_columns is None else compare_columns
+    staged = f'temp.{staging_name(table_name)}'
+    column_list = ', '.join(map(quote, columns))
+    key_list = ', '.join(map(quote, key_names))
+    joined = ' AND '.join(f't.{quote(column)} = s.{quote(column)}' for column in key_names)
+
+    def changed(old, new):
+        return ' OR '.join(f'{old}.{quote(column)} IS NOT {new}.{quote(column)}' for column in compare_columns)
+
+    conn.exec_driver_sql(f'DROP TABLE IF EXISTS {staged}')
+    conn.exec_driver_sql(f'CREATE TEMP TABLE {staging_name(table_name)} AS SELECT {column_list} FROM {table_name} WHERE 0')
+    insert_rows(conn, staged, key, df, keys)
+
+    inserted, updated = conn.exec_driver_sql(f'''
+        SELECT
+            COALESCE(SUM(t.{quote(key_names[0])} IS NULL), 0),
+            COALESCE(SUM(t.{quote(key_names[0])} IS NOT NULL AND ({changed('t', 's')})), 0)
+        FROM {staged} s LEFT JOIN {table_name} t ON {joined}
+    ''').fetchone()
+    conn.exec_driver_sql(f'''
+        INSERT INTO {table_name} ({column_list})
+        SELECT {column_list} FROM {staged} WHERE true
+        ON CONFLICT({key_list}) DO UPDATE SET
+            {', '.join(f'{quote(c)} = excluded.{quote(c)}' for c in df.columns)}
+        WHERE {changed(table_name, 'excluded')}
+    ''')
+    conn.exec_driver_sql(f'DROP TABLE {staged}')
+    return inserted, updated, len(df) - inserted - updated
+
+
+def table_info(conn, table_name):
+    '''Column name -> (declared type, part of primary key) of a table, empty if it doesn't exist'''
+    rows = conn.exec_driver_sql(f'PRAGMA table_info({table_name})').fetchall()
+    return {name: (col_type.upper(), pk > 0) for cid, name, col_type, notnull, default, pk in rows}
+
+
+def rebuild_table(conn, table_name, create_sql, columns, select_exprs):
+    '''Copy a table into a new schema and swap it in, within the caller's transaction
+
+    `create_sql` creates the new table under the staging name of `table_name`.
+    '''
+    rebuilt = staging_name(table_name)
+    conn.exec_driver_sql(f'DROP TABLE IF EXISTS {rebuilt}')
+    conn.exec_driver_sql(create_sql)
+    conn.exec_driver_sql(
+        f'INSERT OR REPLACE INTO {rebuilt} ({", ".join(map(quote, columns))}) '
+        f'SELECT {", ".join(select_exprs)} FROM {table_name}'
+    )
+    conn.exec_driver_sql(f'DROP TABLE {table_name}')
+    conn.exec_driver_sql(f'ALTER TABLE {rebuilt} RENAME TO {table_name}')
+
+
+def migrate_series_table(conn, table_name):
+    '''Convert a FRED table written by DataFrame.to_sql (TEXT dates, FLOAT columns, no
+    primary key) to the typed schema, returns True if the table was rebuilt'''
+    info = table_info(conn, table_name)
+    if not info or info.get('date') == ('INTEGER', True):
+        return False
+    columns = [column for column in info if column != 'date']
+    rebuild_table(
+        conn,
+        table_name,
+        series_table_sql(staging_name(table_name), columns),
+        ['date', *columns],
+        ['CAST(ROUND(julianday(date) - 2440587.5) AS INTEGER)', *map(quote, columns)]
+    )
+    return True
+
+
+def setup_versions_table(conn):
+    '''Per-table data versions, bumped whenever ingestion commits new rows so the dashboard
+    can keep cached query results until the data they came from changes'''
+    conn.exec_driver_sql('''
+    CREATE TABLE IF NOT EXISTS data_versions (
+        table_name TEXT PRIMARY KEY,
+        version INTEGER NOT NULL,
+        updated_at INTEGER
+    )
+    ''')
+
+
+def setup_runs_table(conn):
+    '''One row per ingestion job run, looked up newest first through the (job, started_at)
+    index. Times are unix seconds, step timings and other details are JSON.'''
+    conn.exec_driver_sql('''
+    CREATE TABLE IF NOT EXISTS ingestion_runs (
+        id INTEGER PRIMARY KEY,
+        job TEXT NOT NULL,
+        started_at INTEGER NOT NULL,
+        finished_at INTEGER NOT NULL,
+        duration_ms INTEGER NOT NULL,
+        rows_fetched INTEGER NOT NULL,
+        rows_written INTEGER NOT NULL,
+        error TEXT,
+        details TEXT
+    )
+    ''')
+    conn.exec_driver_sql('CREATE INDEX IF NOT EXISTS ingestion_runs_job ON ingestion_runs (job, started_at)')
+
+
+def bump_versions(conn, table_names):
+    '''Increment the version of every table written, within the caller's transaction'''
+    updated_at = int(pd.Timestamp.now(tz='UTC').timestamp())
+    conn.exec_driver_sql(
+        '''
+        INSERT INTO data_versions (table_name, version, updated_at) VALUES (?, 1, ?)
+        ON CONFLICT(table_name) DO UPDATE SET
+            version = version + 1,
+            updated_at = excluded.updated_at
+        ''',
+        [(table_name, updated_at) for table_name in table_names]
+    )
+
+
+def acquire_lock(name):
+    '''Take an exclusive lock file in the data directory without waiting
+
+    Returns the open lock file, which holds the lock until it is closed or the process
+    exits, or None if another process holds it.
+    '''
+    lock_file = open(os.path.join(DATA_DIR, f'{name}.lock'), 'w')
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        lock_file.close()
+        return None
+    lock_file.write(str(os.getpid()))
+    lock_file.flush()
+    return lock_file
+
+
+@contextmanager
+def replacing(path):
+    '''Yield a temporary path to write `path` to, renamed over `path` once the block
+    succeeds
+
+    Readers (the dashboard, Prometheus) see either the old file or the complete new
+    one, never a partial write. The temporary file is removed if the block fails.
+    '''
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temporary = f'{path}.tmp'
+    try:
+        yield temporary
+        os.replace(temporary, path)
+    except BaseException:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+        raise
+
+
+def serving_path(table_name):
+    return os.path.join(SERVING_DIR, f'{table_name}.arrow')
+
+
+def export_serving_table(conn, table_name):
+    '''Write a FRED table to the serving store as an uncompressed Arrow IPC file
+
+    Dates are stored as timestamps and missing values as NaN rather than nulls, so a
+    memory-mapped read turns into pandas columns without conversion. The table's data
+    version goes into the schema metadata, readers ignore files older than the database.
+    '''
+    version = conn.exec_driver_sql(
+        'SELECT version FROM data_versions WHERE table_name = ?', (table_name,)
+    ).scalar() or 0
+    df = pd.read_sql_query(f'SELECT * FROM {table_name} ORDER BY date', conn)
+    arrays = {'date': pa.array((EPOCH + pd.to_timedelta(df['date'], unit='D')).to_numpy())}
+    for column in df.columns.drop('date'):
+        arrays[column] = pa.array(df[column].to_numpy(dtype='float64'))
+    table = pa.table(arrays).replace_schema_metadata({'version': str(version)})
+
+    with replacing(serving_path(table_name)) as path:
+        with pa.OSFile(path, 'wb') as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    return len(df)
+
+
+def write_job_metrics(job, steps, counts=None, success=True):
+    '''Write the outcome of a job run to METRICS_DIR/<job>.prom for Prometheus to scrape
+
+    `steps` maps step names to their duration in seconds, `counts` names to row or
+    item counts. Metrics are a side channel, failing to write them never fails the job.
+    '''
+    labels = f'job="{job}"'
+    lines = [
+        '# HELP ingestion_step_seconds Duration of each step of the last run',
+        '# TYPE ingestion_step_seconds gauge',
+        *(f'ingestion_step_seconds{{{labels},step="{step}"}} {seconds:.6f}' for step, seconds in steps.items()),
+        '# HELP ingestion_items Items handled by the last run',
+        '# TYPE ingestion_items gauge',
+        *(f'ingestion_items{{{labels},item="{item}"}} {count}' for item, count in (counts or {}).items()),
+        '# HELP ingestion_last_run_success Whether the last run succeeded',
+        '# TYPE ingestion_last_run_success gauge',
+        f'ingestion_last_run_success{{{labels}}} {int(success)}',
+        '# HELP ingestion_last_run_timestamp_seconds When the last run finished',
+        '# TYPE ingestion_last_run_timestamp_seconds gauge',
+        f'ingestion_last_run_timestamp_seconds{{{labels}}} {time.time():.0f}'
+    ]
+    try:
+        with replacing(os.path.join(METRICS_DIR, f'{job}.prom')) as path, open(path, 'w') as f:
+            f.write('\n'.join(lines) + '\n')
+    except OSError as e:
+        print(f'Could not write metrics for {job}: {e}')
+
+
+def record_run(engine, job, started_at, steps, counts=None, rows_fetched=0, rows_written=0, error=None, details=None):
+    '''Record a finished run of `job` in ingestion_runs and in its metrics file
+
+    `started_at` is the unix time the run started and `error` None for a successful
+    run. `details` (e.g. per-series latency) is stored as JSON next to the step timings
+    and counts. Records older than RUN_HISTORY_DAYS are dropped. Call it from a
+    finally block so failed runs are recorded too; failing to record never fails the job.
+    '''
+    finished_at = time.time()
+    write_job_metrics(job, steps, counts, success=error is None)
+    record = {
+        'steps': {step: round(seconds, 3) for step, seconds in steps.items()},
+        'counts': counts or {},
+        **(details or {})
+    }
+    try:
+        with engine.begin() as conn:
+            setup_runs_table(conn)
+            setup_versions_table(conn)
+            conn.exec_driver_sql(
+                '''
+                INSERT INTO ingestion_runs
+                    (job, started_at, finished_at, duration_ms, rows_fetched, rows_written, error, details)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ''',
+                (
+                    job, int(started_at), int(finished_at), round((finished_at - started_at) * 1000),
+                    int(rows_fetched), int(rows_written), error, json.dumps(record)
+                )
+            )
+            conn.exec_driver_sql(
+                'DELETE FROM ingestion_runs WHERE job = ? AND started_at < ?',
+                (job, int(finished_at) - RUN_HISTORY_DAYS * 24 * 60 * 60)
+            )
+            bump_versions(conn, ['ingestion_runs'])
+    except Exception as e:
+        print(f'Could not record the {job} run: {e}')
@@ -0,0 +1,82 @@
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+# the dashboard is run from the repository root, with app.py, utils.py and pages/ importable
+APP_DIR = Path(__file__).resolve().parent.parent
+os.chdir(APP_DIR)
+sys.path.insert(0, str(APP_DIR))
+
+from streamlit.testing.v1 import AppTest
+from storage import DATA_DIR
+
+# written once the caches are warm, the container health check waits for it
+READY_FILE = os.path.join(DATA_DIR, 'ready')
+
+
+def warm_up(timeout=120):
+    '''Render every view of app.py once, headless
+
+    Rendering runs the same loads and figure builds as a real session, so the query and
+    figure results land in the persistent cache the Streamlit process reads. Returns
+    the names of views that failed to render.
+    '''
+    app = AppTest.from_file(str(APP_DIR / 'app.py'), default_timeout=timeout)
+    app.run()
+    # the sidebar has one navigation button per entry of the views map, keyed by name
+    views = [button.key for button in app.sidebar.button]
+
+    failed = []
+    for view in views:
+        start = time.perf_counter()
+        app.session_state['current_view'] = view
+        try:
+            app.run()
+        except Exception as e:
+            # e.g. RuntimeError when the view takes longer than the timeout
+            failed.append(view)
+            print(f'[ERROR] {view}: {e}')
+            continue
+        errors = [error.value for error in app.error] + [str(exception.value) for exception in app.exception]
+        if errors:
+            failed.append(view)
+            print(f'[ERROR] {view}: {errors}')
+        else:
+            print(f'Warmed {view} in {(time.perf_counter() - start) * 1000:.0f} ms')
+    return failed
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Dashboard Cache Warm-up',
+        formatter_class=argparse.RawTextHelpFormatter
+    )
+    parser.add_argument(
+        '--timeout',
+        type=int,
+        default=120,
+        metavar='SECONDS',
+        help='Seconds a single view may take to render (default: 120)'
+    )
+
+    args = parser.parse_args()
+
+    if os.path.exists(READY_FILE):
+        os.remove(READY_FILE)
+
+    start = time.perf_counter()
+    try:
+        failed = warm_up(args.timeout)
+        if failed:
+            print(f'Views that failed to warm up: {", ".join(failed)}')
+    finally:
+        # mark ready even if warming up failed, a broken page shouldn't keep the whole app down
+        with open(READY_FILE, 'w') as f:
+            f.write(f'{int(time.time())}\n')
+        print(f'Warm-up finished in {time.perf_counter() - start:.1f} s')
+
+
+if __name__=='__main__':
+    main()
@@ -6,10 +6,30 @@ exec >> /var/log/cron.log 2>&1
 service cron start
 echo "$(date): Starting cron service..."
 
-# Check if database exists and has data
-if [ ! -f "/Economic-Data-Dashboard/data/economics_data.db" ] || [ ! -s "/Economic-Data-Dashboard/data/economics_data.db" ]; then
-    echo "$(date): No existing data found. Running initial data collection..."
-fi
+# The health check reports ready only once the caches are warm
+rm -f /Economic-Data-Dashboard/data/ready
+
+# Catch up on FRED data, then warm the caches in the background. Incremental mode
+# does a full fetch of every series without a watermark, so a new or partially
+# filled database is completed here whatever else created the file.
+(
+    cd /Economic-Data-Dashboard
+    echo "$(date): Running initial data collection..."
+    python scripts/fred_data_retrieval.py
+    echo "$(date): Warming up caches..."
+    python scripts/warmup.py
+) &
+
+# Keep the minute data collector running, restart it if it exits
+echo "$(date): Starting minute data daemon..."
+(
+    cd /Economic-Data-Dashboard
+    while true; do
+        python scripts/minute_data.py --mode daemon
+        echo "$(date): Minute data daemon exited, restarting in 10 seconds..."
+        sleep 10
+    done
+) &
 
 # Start Streamlit
 echo "$(date): Starting Streamlit..."
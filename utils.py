@@ -1,40 +1,746 @@
+import os
+import re
+import json
+import hashlib
 import sqlite3
+import time
+import queue
+import threading
+from collections import deque
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 import streamlit as st
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
 from datetime import datetime
+from cachetools import LRUCache
 import plotly.graph_objects as go
+import plotly.io as pio
 
-def get_database_connection():
-    db_path = Path('/Economic-Data-Dashboard/data/economics_data.db')
-    db_path.parent.mkdir(parents=True, exist_ok=True)    
-    if not db_path.exists():
-        conn = sqlite3.connect(db_path)
+DB_PATH = Path('/Economic-Data-Dashboard/data/economics_data.db')
+
+# Arrow IPC copies of the FRED tables written by ingestion, memory-mapped on read
+SERVING_DIR = DB_PATH.parent / 'serving'
+
+# minute bars moved out of SQLite by the retention job, one Parquet partition per UTC day
+MINUTE_ARCHIVE = DB_PATH.parent / 'archive' / 'minute_bars'
+
+# stored dates are integers counted from this epoch (days for FRED series)
+EPOCH = pd.Timestamp('1970-01-01')
+
+# presets of the shared date range control, in years back from today (None for all data)
+DATE_RANGES = {'1Y': 1, '3Y': 3, '5Y': 5, '10Y': 10, 'Max': None}
+DEFAULT_DATE_RANGE = '5Y'
+
+# how often the data versions written by ingestion are re-read (seconds)
+VERSION_CHECK_SECONDS = 5
+
+# query results persisted for other processes and restarts, None to keep them in memory only
+QUERY_CACHE_PATH = DB_PATH.parent / 'cache' / 'query_cache.db'
+QUERY_CACHE_MAX_BYTES = 256 * 1024 * 1024
+# a hit refreshes an entry's LRU position at most this often (seconds)
+QUERY_CACHE_TOUCH_SECONDS = 60
+
+# cached frames may keep float columns as float32 and daily dates as int32 day numbers,
+# halving their memory for some precision and a date conversion on every read
+CACHE_FLOAT32 = False
+CACHE_INT_DATES = False
+
+# minute bars held per symbol by the live buffers, e.g. 3 * 24 * 60 for three days
+MINUTE_WINDOW = 300
+# recent bars re-read on every refresh, ingestion may still revise them (seconds)
+MINUTE_REFRESH_SECONDS = 5 * 60
+# a buffer polls the database at most this often however many sessions read it (seconds)
+MINUTE_POLL_SECONDS = 5
+# how often the live minute charts redraw themselves (seconds)
+LIVE_REFRESH_SECONDS = 15
+MINUTE_BAR_COLUMNS = ('Open', 'High', 'Low', 'Close', 'Volume')
+DEFAULT_SYMBOL = 'BTC-USD'
+
+# time spans offered for minute data (seconds); a span is read from the finest bar
+# table that keeps it within the points a chart can show
+MINUTE_SPANS = {'6H': 6 * 3600, '1D': 24 * 3600, '1W': 7 * 24 * 3600, '1M': 30 * 24 * 3600, '1Y': 365 * 24 * 3600}
+DEFAULT_MINUTE_SPAN = '6H'
+BAR_TABLES = {60: 'minute_bars', 5 * 60: 'minute_bars_5m', 3600: 'minute_bars_1h', 24 * 3600: 'minute_bars_1d'}
+BAR_LABELS = {60: '1m', 5 * 60: '5m', 3600: '1h', 24 * 3600: '1d'}
+
+# traces are downsampled to about two points per horizontal pixel of a full-width chart
+CHART_WIDTH_PX = 1400
+POINTS_PER_PIXEL = 2
+
+# above this many points in a figure, line traces are drawn with WebGL instead of SVG
+WEBGL_POINT_THRESHOLD = 5000
+
+# number of serialized figures kept per process
+FIGURE_CACHE_SIZE = 128
+
+IDENTIFIER = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*$')
+
+# timings kept per timer for the latency percentiles of the performance panel
+METRICS_SAMPLES = 1000
+# Prometheus text file of the dashboard's metrics, rewritten at most every
+# METRICS_WRITE_SECONDS; None to disable
+METRICS_PATH = DB_PATH.parent / 'metrics' / 'dashboard.prom'
+METRICS_WRITE_SECONDS = 15
+# show the performance panel in the sidebar
+PERFORMANCE_PANEL = True
+
+# ingestion jobs recording their runs in the ingestion_runs table, and their shared log
+INGESTION_JOBS = ('fred', 'minute_data', 'retention')
+LOG_PATH = Path('/var/log/cron.log')
+# the log is read backwards from its end in blocks of this many bytes
+LOG_TAIL_BLOCK = 4096
+# show the latest run of each job and the log tail in the sidebar
+INGESTION_PANEL = True
+
+# read connections shared by every session of this process
+POOL_SIZE = 8
+CONNECTION_PRAGMAS = (
+    'PRAGMA query_only = ON',
+    'PRAGMA mmap_size = 268435456',  # 256 MB
+    'PRAGMA cache_size = -16384',    # 16 MB per connection
+    'PRAGMA temp_store = MEMORY',
+)
+
+# threads loading page data concurrently, at most one connection each
+PREFETCH_WORKERS = POOL_SIZE
+
+
+class Metrics:
+    '''Timers and counters of this process, shared by every session
+
+    A timer is keyed by (kind, name), e.g. ('page', 'Interest Rates'), and keeps a
+    running count and sum plus its last METRICS_SAMPLES durations for percentiles.
+    '''
+
+    def __init__(self, samples=METRICS_SAMPLES):
+        self.samples = samples
+        self.timers = {}
+        self.counters = {}
+        self.written = None
+        self.lock = threading.Lock()
+
+    def observe(self, kind, name, seconds):
+        with self.lock:
+            timer = self.timers.get((kind, name))
+            if timer is None:
+                timer = self.timers[(kind, name)] = {'count': 0, 'sum': 0.0, 'samples': deque(maxlen=self.samples)}
+            timer['count'] += 1
+            timer['sum'] += seconds
+            timer['samples'].append(seconds)
+
+    def count(self, name, value=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def summary(self):
+        '''Count, sum, p50 and p95 in seconds of every timer'''
+        with self.lock:
+            timers = {key: (timer['count'], timer['sum'], list(timer['samples'])) for key, timer in self.timers.items()}
+        return {
+            key: {'count': count, 'sum': total, 'p50': np.percentile(samples, 50), 'p95': np.percentile(samples, 95)}
+            for key, (count, total, samples) in timers.items()
+        }
+
+
+@st.cache_resource(show_spinner=False)
+def get_metrics():
+    return Metrics()
+
+
+@contextmanager
+def timed(kind, name):
+    '''Record how long the block takes under the timer (kind, name)'''
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        get_metrics().observe(kind, name, time.perf_counter() - start)
+
+
+def cache_hit_counts(stats):
+    '''(hits, misses) per cache: query results in memory and on disk, and figures
+
+    `stats` is DataCache.stats(), which scans the persistent cache; take it once per
+    rerun and pass it on.
+    '''
+    counters = dict(get_metrics().counters)
+    figure_hits = counters.get('figure_memory_hits', 0), counters.get('figure_persistent_hits', 0)
+    figure_builds = counters.get('figure_builds', 0)
+    counts = {'query_memory': (stats['memory']['hits'], stats['memory']['misses'])}
+    if 'persistent' in stats:
+        counts['query_persistent'] = (stats['persistent']['hits'], stats['persistent']['misses'])
+    counts['figure_memory'] = (figure_hits[0], figure_hits[1] + figure_builds)
+    counts['figure_persistent'] = (figure_hits[1], figure_builds)
+    return counts
+
+
+def label_value(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def metrics_text(stats):
+    '''Metrics of this process in the Prometheus text exposition format, with the
+    DataCache.stats() `stats`'''
+    lines = [
+        '# HELP dashboard_duration_seconds Time spent in pages, charts, data loads and connection waits',
+        '# TYPE dashboard_duration_seconds summary'
+    ]
+    for (kind, name), timer in sorted(get_metrics().summary().items()):
+        labels = f'kind="{label_value(kind)}",name="{label_value(name)}"'
+        for quantile, key in (('0.5', 'p50'), ('0.95', 'p95')):
+            lines.append(f'dashboard_duration_seconds{{{labels},quantile="{quantile}"}} {timer[key]:.6f}')
+        lines.append(f'dashboard_duration_seconds_sum{{{labels}}} {timer["sum"]:.6f}')
+        lines.append(f'dashboard_duration_seconds_count{{{labels}}} {timer["count"]}')
+
+    lines += [
+        '# HELP dashboard_cache_requests_total Cache lookups by cache and result',
+        '# TYPE dashboard_cache_requests_total counter'
+    ]
+    for cache, (hits, misses) in cache_hit_counts(stats).items():
+        lines.append(f'dashboard_cache_requests_total{{cache="{cache}",result="hit"}} {hits}')
+        lines.append(f'dashboard_cache_requests_total{{cache="{cache}",result="miss"}} {misses}')
+
+    lines += [
+        '# HELP dashboard_cache_bytes Size of the cached query results',
+        '# TYPE dashboard_cache_bytes gauge',
+        f'dashboard_cache_bytes{{cache="query_memory"}} {stats["memory"]["bytes"]}'
+    ]
+    if 'persistent' in stats:
+        lines.append(f'dashboard_cache_bytes{{cache="query_persistent"}} {stats["persistent"]["bytes"]}')
+    return '\n'.join(lines) + '\n'
+
+
+def write_metrics_file(stats=None, path=METRICS_PATH):
+    '''Replace the Prometheus text file, at most once per METRICS_WRITE_SECONDS
+
+    `stats` is the rerun's DataCache.stats(), taken here only if it is None and the
+    file is due.
+    '''
+    if path is None:
+        return
+    metrics = get_metrics()
+    now = time.monotonic()
+    with metrics.lock:
+        if metrics.written is not None and now - metrics.written < METRICS_WRITE_SECONDS:
+            return
+        metrics.written = now
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temporary = path.with_suffix('.tmp')
+        temporary.write_text(metrics_text(stats if stats is not None else get_data_cache().stats()))
+        temporary.replace(path)
+    except OSError as e:
+        print(f'Could not write metrics file: {e}')
+
+
+def performance_panel(stats):
+    '''Sidebar expander with the p50/p95 latencies of this process and the cache hit
+    rates of DataCache.stats() `stats`'''
+    with st.expander('Performance'):
+        rows = [
+            {
+                'Kind': kind,
+                'Name': name,
+                'Count': timer['count'],
+                'p50 ms': round(timer['p50'] * 1000, 1),
+                'p95 ms': round(timer['p95'] * 1000, 1)
+            }
+            for (kind, name), timer in sorted(get_metrics().summary().items())
+        ]
+        if rows:
+            st.dataframe(pd.DataFrame(rows), hide_index=True, use_container_width=True)
+        else:
+            st.caption('No timings recorded yet')
+
+        for cache, (hits, misses) in cache_hit_counts(stats).items():
+            rate = hits / (hits + misses) if hits + misses else 0
+            st.caption(f'{cache}: {rate:.0%} hit rate ({hits} hits, {misses} misses)')
+        st.caption(f'Cached query results: {stats["memory"]["bytes"] / 2 ** 20:.1f} MB')
+
+
+class ConnectionPool:
+    '''Pool of read-only SQLite connections, opened lazily and tuned once'''
+
+    def __init__(self, db_path, size=POOL_SIZE):
+        self.uri = f'file:{db_path}?mode=ro'
+        self.size = size
+        self.created = 0
+        self.idle = queue.LifoQueue()
+        self.lock = threading.Lock()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.uri, uri=True, check_same_thread=False)
+        for pragma in CONNECTION_PRAGMAS:
+            conn.execute(pragma)
+        return conn
+
+    def _acquire(self):
+        try:
+            return self.idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self.lock:
+            if self.created < self.size:
+                self.created += 1
+                create = True
+            else:
+                create = False
+        if not create:
+            return self.idle.get()
+        try:
+            return self._connect()
+        except Exception:
+            with self.lock:
+                self.created -= 1
+            raise
+
+    @contextmanager
+    def connection(self):
+        with timed('connection', 'wait'):
+            conn = self._acquire()
+        try:
+            yield conn
+        finally:
+            self.idle.put(conn)
+
+
+@st.cache_resource(show_spinner=False)
+def get_connection_pool():
+    DB_PATH.parent.mkdir(parents=True, exist_ok=True)
+    if not DB_PATH.exists():
+        conn = sqlite3.connect(DB_PATH)
         conn.close()
-        st.success(f'Database initialized at {db_path}')
-        '''
-        st.error(f'Database file not found at {db_path}')
-        raise FileNotFoundError(f'Database file not found at {db_path}')        
-        '''
-    # Return a connection to the database
+        st.success(f'Database initialized at {DB_PATH}')
+
+    # WAL lets readers keep going while ingestion writes; the mode is stored in the file
+    try:
+        conn = sqlite3.connect(DB_PATH, timeout=1)
+        conn.execute('PRAGMA journal_mode = WAL')
+        conn.close()
+    except sqlite3.Error as e:
+        print(f'Could not enable WAL mode: {e}')
+
+    return ConnectionPool(DB_PATH)
+
+
+@contextmanager
+def get_database_connection():
+    # Borrow a pooled connection to the database
     try:
-        return sqlite3.connect(db_path)
+        pool = get_connection_pool()
     except Exception as e:
         st.error(f"Error connecting to the database: {e}")
         raise
+    with pool.connection() as conn:
+        yield conn
+
+
+def to_datetime(values, unit):
+    '''Convert a stored date column: integers counted in `unit` since 1970-01-01,
+    or text for tables not yet migrated to the typed schema'''
+    if pd.api.types.is_integer_dtype(values):
+        return pd.to_datetime(values, unit=unit)
+    return pd.to_datetime(values)
+
+
+def date_range_selector():
+    st.radio(
+        'Date range',
+        list(DATE_RANGES),
+        index=list(DATE_RANGES).index(DEFAULT_DATE_RANGE),
+        horizontal=True,
+        key='date_range'
+    )
+
 
-@st.cache_data(ttl=24*3600)  # cache for 24 hrs
-def load_data(query):
+def get_date_range():
+    '''(start, end) dates selected in the shared date range control, None meaning unbounded'''
+    years = DATE_RANGES.get(st.session_state.get('date_range', DEFAULT_DATE_RANGE))
+    if years is None:
+        return None, None
+    start = pd.Timestamp.today().normalize() - pd.DateOffset(years=years)
+    return start.date(), None
+
+
+def check_identifier(name):
+    if not IDENTIFIER.match(name):
+        raise ValueError(f'Invalid table or column name: {name}')
+    return name
+
+
+def range_condition(start=None, end=None):
+    '''WHERE clause bounding the date column to a window, with day-number params compared
+    against the integer primary key, so only the rows inside the window are read'''
+    conditions, params = [], []
+    if start is not None:
+        conditions.append('date >= ?')
+        params.append((pd.Timestamp(start) - EPOCH).days)
+    if end is not None:
+        conditions.append('date <= ?')
+        params.append((pd.Timestamp(end) - EPOCH).days)
+    return (f' WHERE {" AND ".join(conditions)}' if conditions else ''), params
+
+
+def build_range_query(table, columns=None, start=None, end=None):
+    '''SELECT for a date window of a table'''
+    select = ', '.join(['date', *(f'"{check_identifier(column)}"' for column in columns)]) if columns else '*'
+    where, params = range_condition(start, end)
+    return f'SELECT {select} FROM {check_identifier(table)}{where} ORDER BY date', params
+
+
+def build_series_query(series, start=None, end=None):
+    '''SELECT joining (table, column) series on the union of their dates within a window'''
+    tables = list(dict.fromkeys(check_identifier(table) for table, column in series))
+    aliases = {table: f't{i}' for i, table in enumerate(tables)}
+    where, params = range_condition(start, end)
+    dates = ' UNION '.join(f'SELECT date FROM {table}{where}' for table in tables)
+    select = ', '.join(f'{aliases[table]}."{check_identifier(column)}"' for table, column in series)
+    joins = ' '.join(f'LEFT JOIN {table} {alias} ON {alias}.date = d.date' for table, alias in aliases.items())
+    query = f'WITH dates(date) AS ({dates}) SELECT d.date, {select} FROM dates d {joins} ORDER BY d.date'
+    return query, params * len(tables)
+
+
+def get_data_versions():
+    '''Version of every table, bumped by the ingestion scripts on each commit'''
     try:
         with get_database_connection() as conn:
-            df = pd.read_sql_query(query, conn)
-
-        if 'date' not in df.columns:
-            st.error(f'Date column not found in query result. Available columns: {df.columns.to_list()}')
-            raise KeyError('Date column not found in query result.')
-        
-        df['date'] = pd.to_datetime(df['date'])
-        df.set_index('date', inplace=True)
+            return dict(conn.execute('SELECT table_name, version FROM data_versions').fetchall())
+    except sqlite3.OperationalError:
+        # no data ingested since versions were introduced
+        return {}
+
+
+class SQLiteCacheBackend:
+    '''Query results persisted as Arrow IPC blobs in a SQLite file
+
+    Every process pointing at the same file shares it, so replicas and restarted
+    containers start warm. get_blob/put_blob store raw bytes, such as serialized
+    figures. Entries are keyed by table, data version and query, an entry for an
+    outdated version is never returned and is deleted when the table's new version
+    is stored. The least recently used entries are evicted once the
+    blobs exceed `max_bytes`. Hit and miss counts are added to the shared totals
+    whenever the backend writes anyway.
+
+    The blob is the last column of a row, so scans of the sizes and LRU times don't
+    read through each blob's overflow pages.
+    '''
+
+    def __init__(self, path, max_bytes=QUERY_CACHE_MAX_BYTES):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.counts = {'hits': 0, 'misses': 0}
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=5)
+        self.conn.execute('PRAGMA journal_mode = WAL')
+        columns = [row[1] for row in self.conn.execute('PRAGMA table_info(entries)')]
+        if columns and columns[-1] != 'value':
+            # files written with the blob before the other columns are just a cache, start over
+            self.conn.execute('DROP TABLE entries')
+        self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY,
+                table_name TEXT NOT NULL,
+                version TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                last_used INTEGER NOT NULL,
+                value BLOB NOT NULL
+            )
+        ''')
+        self.conn.execute('CREATE INDEX IF NOT EXISTS entries_last_used ON entries (last_used)')
+        self.conn.execute('CREATE INDEX IF NOT EXISTS entries_table ON entries (table_name)')
+        self.conn.execute('CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, count INTEGER NOT NULL)')
+
+    @staticmethod
+    def entry_key(table, version, key):
+        return hashlib.md5(repr((table, version, key)).encode()).hexdigest()
+
+    def flush_counts(self):
+        self.conn.executemany(
+            '''
+            INSERT INTO counters (name, count) VALUES (?, ?)
+            ON CONFLICT(name) DO UPDATE SET count = count + excluded.count
+            ''',
+            list(self.counts.items())
+        )
+        self.counts = dict.fromkeys(self.counts, 0)
+
+    def get_blob(self, table, version, key):
+        entry_key = self.entry_key(table, version, key)
+        with self.lock:
+            row = self.conn.execute('SELECT value, last_used FROM entries WHERE key = ?', (entry_key,)).fetchone()
+            if row is None:
+                self.counts['misses'] += 1
+                return None
+            self.counts['hits'] += 1
+            now = int(time.time())
+            if now - row[1] > QUERY_CACHE_TOUCH_SECONDS:
+                try:
+                    self.conn.execute('BEGIN')
+                    self.conn.execute('UPDATE entries SET last_used = ? WHERE key = ?', (now, entry_key))
+                    self.flush_counts()
+                    self.conn.execute('COMMIT')
+                except sqlite3.Error:
+                    # the touch only refreshes the LRU position, a locked file must not lose the hit
+                    if self.conn.in_transaction:
+                        self.conn.execute('ROLLBACK')
+        return row[0]
+
+    def put_blob(self, table, version, key, value):
+        with self.lock:
+            self.conn.execute('BEGIN IMMEDIATE')
+            try:
+                self.conn.execute(
+                    'DELETE FROM entries WHERE table_name = ? AND version != ?', (repr(table), repr(version))
+                )
+                self.conn.execute(
+                    '''
+                    INSERT OR REPLACE INTO entries (key, table_name, version, size, last_used, value)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                    ''',
+                    (self.entry_key(table, version, key), repr(table), repr(version), len(value), int(time.time()), value)
+                )
+                self.evict()
+                self.flush_counts()
+                self.conn.execute('COMMIT')
+            except Exception:
+                self.conn.execute('ROLLBACK')
+                raise
+
+    def get(self, table, version, key):
+        value = self.get_blob(table, version, key)
+        return None if value is None else pa.ipc.open_stream(value).read_all().to_pandas()
+
+    def put(self, table, version, key, df):
+        sink = pa.BufferOutputStream()
+        arrow_table = pa.Table.from_pandas(df)
+        with pa.ipc.new_stream(sink, arrow_table.schema) as writer:
+            writer.write_table(arrow_table)
+        self.put_blob(table, version, key, sink.getvalue().to_pybytes())
+
+    def evict(self):
+        '''Delete the least recently used entries until the blobs fit in max_bytes'''
+        total = self.conn.execute('SELECT COALESCE(SUM(size), 0) FROM entries').fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        evicted = []
+        for entry_key, size in self.conn.execute('SELECT key, size FROM entries ORDER BY last_used'):
+            if total <= self.max_bytes:
+                break
+            evicted.append((entry_key,))
+            total -= size
+        self.conn.executemany('DELETE FROM entries WHERE key = ?', evicted)
+
+    def stats(self):
+        '''Hit and miss totals of every process sharing the file, entry count and size'''
+        with self.lock:
+            shared = dict(self.conn.execute('SELECT name, count FROM counters').fetchall())
+            entries, size = self.conn.execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries').fetchone()
+            return {
+                'hits': shared.get('hits', 0) + self.counts['hits'],
+                'misses': shared.get('misses', 0) + self.counts['misses'],
+                'entries': entries,
+                'bytes': size
+            }
+
+
+def freeze_frame(df):
+    '''Frame sharing the data of `df`, with every column read-only'''
+    columns = {}
+    for column in df.columns:
+        values = df[column].to_numpy().view()
+        values.flags.writeable = False
+        columns[column] = values
+    return pd.DataFrame(columns, index=df.index, copy=False)
+
+
+def compact_frame(df):
+    '''Frame as kept by the cache, downcast per CACHE_FLOAT32 and CACHE_INT_DATES'''
+    if CACHE_FLOAT32:
+        df = df.astype({column: 'float32' for column, dtype in df.dtypes.items() if dtype == 'float64'})
+    if CACHE_INT_DATES and isinstance(df.index, pd.DatetimeIndex) and (df.index == df.index.normalize()).all():
+        days = (df.index - EPOCH).days.astype('int32')
+        df = df.set_axis(pd.Index(days, name=df.index.name))
+    return df
+
+
+def share_frame(df):
+    '''Caller's view of a cached frame: its own columns and index over the shared,
+    read-only data'''
+    df = df.copy(deep=False)
+    if CACHE_INT_DATES and df.index.dtype == 'int32':
+        df.index = pd.DatetimeIndex(to_datetime(df.index, unit='D'), name=df.index.name)
+    return df
+
+
+class DataCache:
+    '''Query results grouped by table and tagged with the table's data version
+
+    Entries don't expire on a timer. Once ingestion bumps a table's version, the
+    entries of that table, and only that table, are dropped at the next lookup.
+    Results spanning several tables are grouped under the tuple of their names.
+
+    DataFrames are stored once per process with read-only columns, and every get
+    returns a view of them, so sessions share the data instead of copying it on each
+    hit. Writing to a returned frame raises ValueError, copy it first.
+
+    A persistent `backend` (see SQLiteCacheBackend) is consulted on a miss and
+    receives every DataFrame stored, so other processes and restarts find it there.
+    '''
+
+    def __init__(self, backend=None):
+        self.tables = {}
+        self.versions = {}
+        self.versions_checked = None
+        self.backend = backend
+        self.counts = {'hits': 0, 'misses': 0}
+        self.lock = threading.Lock()
+
+    def get_version(self, table):
+        now = time.monotonic()
+        if self.versions_checked is None or now - self.versions_checked > VERSION_CHECK_SECONDS:
+            self.versions = get_data_versions()
+            self.versions_checked = now
+        return self.versions.get(table, 0)
+
+    def get(self, table, version, key):
+        with self.lock:
+            entry = self.tables.get(table)
+            value = None if entry is None or entry[0] != version else entry[1].get(key)
+            self.counts['misses' if value is None else 'hits'] += 1
+        if value is None and self.backend is not None:
+            try:
+                value = self.backend.get(table, version, key)
+            except Exception:
+                value = None
+            if value is not None:
+                return self.put(table, version, key, value, persist=False)
+        return share_frame(value) if isinstance(value, pd.DataFrame) else value
+
+    def put(self, table, version, key, value, persist=True):
+        '''Store `value` and return it, as a view for DataFrames'''
+        is_frame = isinstance(value, pd.DataFrame)
+        # the backend gets the full precision frame, other processes may not compact theirs
+        if persist and is_frame and self.backend is not None:
+            try:
+                self.backend.put(table, version, key, value)
+            except Exception:
+                # the persistent cache is an optimization, a locked or full disk must not fail the page
+                pass
+        if is_frame:
+            value = freeze_frame(compact_frame(value))
+        with self.lock:
+            entry = self.tables.get(table)
+            if entry is None or entry[0] != version:
+                entry = self.tables[table] = (version, {})
+            entry[1][key] = value
+        return share_frame(value) if is_frame else value
+
+    def stats(self):
+        '''Hit and miss counts, entry count and frame bytes of this process, plus the
+        backend's shared stats'''
+        with self.lock:
+            values = [value for version, entries in self.tables.values() for value in entries.values()]
+            frames = [value for value in values if isinstance(value, pd.DataFrame)]
+            stats = {'memory': {
+                **self.counts,
+                'entries': len(values),
+                'bytes': int(sum(df.memory_usage(index=True).sum() for df in frames))
+            }}
+        if self.backend is not None:
+            stats['persistent'] = self.backend.stats()
+        return stats
+
+
+@st.cache_resource(show_spinner=False)
+def get_data_cache():
+    backend = None
+    if QUERY_CACHE_PATH:
+        try:
+            backend = SQLiteCacheBackend(QUERY_CACHE_PATH)
+        except (OSError, sqlite3.Error) as e:
+            # without the persistent cache every process keeps its results in memory only
+            print(f'Could not open the query cache at {QUERY_CACHE_PATH}: {e}')
+    return DataCache(backend)
+
+
+def query_data(table, columns=None, start=None, end=None):
+    query, params = build_range_query(table, columns, start, end)
+    with get_database_connection() as conn:
+        df = pd.read_sql_query(query, conn, params=params)
+
+    if 'date' not in df.columns:
+        st.error(f'Date column not found in query result. Available columns: {df.columns.to_list()}')
+        raise KeyError('Date column not found in query result.')
+
+    df['date'] = to_datetime(df['date'], unit='D')
+    df.set_index('date', inplace=True)
+    return df
+
+
+@st.cache_resource(show_spinner=False)
+def get_prefetch_pool():
+    return ThreadPoolExecutor(max_workers=PREFETCH_WORKERS, thread_name_prefix='prefetch')
+
+
+def prefetch(datasets):
+    '''Start every load of `datasets`, a dict of name -> (function, *args), on the
+    prefetch pool and return a dict of name -> Future
+
+    A page waits on the future of each chart's data just before drawing it, so charts
+    stream in as their data arrives instead of after the slowest load. Errors are raised
+    by Future.result() in the page.
+    '''
+    pool = get_prefetch_pool()
+    return {name: pool.submit(function, *args) for name, (function, *args) in datasets.items()}
+
+
+def read_serving_file(table, columns=None, start=None, end=None, version=0):
+    '''Date window of a table from its memory-mapped Arrow file in the serving store
+
+    The window is located with a binary search on the date column and sliced without
+    copying, and the numeric columns become pandas columns backed by the mapped file.
+    Returns None if the file is missing, lacks a column, or was written for another
+    data version than the database's, so the caller can fall back to SQLite.
+    '''
+    try:
+        source = pa.memory_map(str(SERVING_DIR / f'{check_identifier(table)}.arrow'))
+        arrow_table = pa.ipc.open_file(source).read_all()
+        metadata = arrow_table.schema.metadata or {}
+        if int(metadata.get(b'version', -1)) != version:
+            return None
+        arrow_table = arrow_table.select(['date', *columns] if columns else arrow_table.column_names)
+    except (FileNotFoundError, KeyError, pa.ArrowInvalid):
+        return None
+
+    dates = arrow_table.column('date').to_numpy()
+    first = np.searchsorted(dates, np.datetime64(pd.Timestamp(start)), 'left') if start is not None else 0
+    last = np.searchsorted(dates, np.datetime64(pd.Timestamp(end)), 'right') if end is not None else len(dates)
+    df = arrow_table.slice(first, last - first).to_pandas(split_blocks=True)
+    df.set_index('date', inplace=True)
+    return df
+
+
+def load_data(table, columns=None, start=None, end=None):
+    '''Load a date window of a table, cached until the table's data version changes
+
+    Reads come from the serving store when its file is current, SQLite otherwise.
+    The frame shares its data with the cache and is read-only.
+    '''
+    try:
+        cache = get_data_cache()
+        version = cache.get_version(table)
+        key = (tuple(columns) if columns else None, start, end)
+        with timed('load', table):
+            df = cache.get(table, version, key)
+            if df is None:
+                df = read_serving_file(table, columns, start, end, version)
+                if df is None:
+                    df = query_data(table, columns, start, end)
+                df = cache.put(table, version, key, df)
         return df
     
     except Exception as e:
@@ -42,23 +748,265 @@ def load_data(query):
         raise e
     
 
-def load_btc_data():
+def read_serving_series(series, start, end, versions):
+    '''Series aligned on date from the serving store, None unless every file is current'''
+    frames = []
+    for table in versions:
+        columns = tuple(column for series_table, column in series if series_table == table)
+        df = read_serving_file(table, columns, start, end, versions[table])
+        if df is None:
+            return None
+        frames.append(df)
+    return pd.concat(frames, axis=1).sort_index()[[column for table, column in series]]
+
+
+def query_series(series, start=None, end=None):
+    query, params = build_series_query(series, start, end)
+    with get_database_connection() as conn:
+        df = pd.read_sql_query(query, conn, params=params)
+    df['date'] = to_datetime(df['date'], unit='D')
+    df.set_index('date', inplace=True)
+    return df.astype('float64')
+
+
+def load_series(series, start=None, end=None):
+    '''Load several series as one frame aligned on date, in one round-trip
+
+    `series` lists (table, column) pairs. The frame has one column per series, named
+    after the column, and NaN where a series has no observation on a date. It is
+    cached until the data version of one of its tables changes, and read-only.
+    '''
     try:
+        series = tuple((table, column) for table, column in series)
+        columns = [column for table, column in series]
+        if len(set(columns)) != len(columns):
+            raise ValueError(f'Series columns must be unique: {columns}')
+
+        cache = get_data_cache()
+        tables = tuple(dict.fromkeys(table for table, column in series))
+        versions = tuple(cache.get_version(table) for table in tables)
+        key = (series, start, end)
+        with timed('load', '+'.join(tables)):
+            df = cache.get(tables, versions, key)
+            if df is None:
+                df = read_serving_series(series, start, end, dict(zip(tables, versions)))
+                if df is None:
+                    df = query_series(series, start, end)
+                df = cache.put(tables, versions, key, df)
+        return df
+
+    except Exception as e:
+        st.error(f'Error loading data: {e}')
+        raise e
+
+
+class RingBuffer:
+    '''Fixed-size, time-ordered buffer of minute bars backed by numpy arrays
+
+    Appending overwrites the oldest bars once the buffer is full, so keeping it up to
+    date costs O(new bars) no matter how large the window is.
+    '''
+
+    def __init__(self, capacity, columns):
+        self.capacity = capacity
+        self.columns = list(columns)
+        self.times = np.zeros(capacity, dtype='int64')
+        self.values = np.full((capacity, len(self.columns)), np.nan)
+        self.start = 0
+        self.size = 0
+        self.frame = None
+        self.polled = None
+        self.lock = threading.Lock()
+
+    def positions(self, first=0):
+        return (self.start + np.arange(first, self.size)) % self.capacity
+
+    def last_time(self):
+        return int(self.times[(self.start + self.size - 1) % self.capacity]) if self.size else None
+
+    def tail_start(self, since):
+        '''Offset of the first buffered bar at or after `since`'''
+        return self.size - int(np.count_nonzero(self.times[self.positions()] >= since))
+
+    def replace_tail(self, since, times, values):
+        '''Replace the bars at or after `since` with `times`/`values`, returns False if
+        they were already identical'''
+        first = self.tail_start(since)
+        current = self.positions(first)
+        if np.array_equal(self.times[current], times) and np.array_equal(self.values[current], values, equal_nan=True):
+            return False
+
+        self.size = first
+        if len(times) >= self.capacity:
+            times, values = times[-self.capacity:], values[-self.capacity:]
+            self.start, self.size = 0, 0
+        positions = (self.start + self.size + np.arange(len(times))) % self.capacity
+        self.times[positions] = times
+        self.values[positions] = values
+        overflow = max(0, self.size + len(times) - self.capacity)
+        self.start = (self.start + overflow) % self.capacity
+        self.size = min(self.capacity, self.size + len(times))
+        self.frame = None
+        return True
+
+    def to_frame(self):
+        '''Buffered bars oldest first, rebuilt only after the buffer changed'''
+        if self.frame is None:
+            positions = self.positions()
+            index = pd.DatetimeIndex(to_datetime(self.times[positions], unit='s'), name='Datetime')
+            self.frame = freeze_frame(pd.DataFrame(self.values[positions], index=index, columns=self.columns))
+        return self.frame
+
+
+@st.cache_resource(show_spinner=False)
+def get_minute_buffer(symbol, window):
+    return RingBuffer(window, MINUTE_BAR_COLUMNS)
+
+
+def fetch_minute_rows(conn, query, params):
+    rows = conn.execute(query, params).fetchall()
+    times = np.array([row[0] for row in rows], dtype='int64')
+    values = np.array([row[1:] for row in rows], dtype='float64').reshape(len(rows), len(MINUTE_BAR_COLUMNS))
+    return times, values
+
+
+def load_archived_bars(symbol, start, end):
+    '''Archived minute bars of a symbol with start <= ts < end, as (times, values) arrays
+
+    Only the daily partitions overlapping the range are opened.
+    '''
+    if not MINUTE_ARCHIVE.exists():
+        return np.empty(0, dtype='int64'), np.empty((0, len(MINUTE_BAR_COLUMNS)))
+    dataset = ds.dataset(
+        MINUTE_ARCHIVE,
+        format='parquet',
+        partitioning=ds.partitioning(pa.schema([('date', pa.string())]), flavor='hive')
+    )
+    days = [time.strftime('%Y-%m-%d', time.gmtime(ts)) for ts in (start, end)]
+    table = dataset.to_table(
+        columns=['ts', *MINUTE_BAR_COLUMNS],
+        filter=(
+            (ds.field('date') >= days[0]) & (ds.field('date') <= days[1])
+            & (ds.field('symbol') == symbol) & (ds.field('ts') >= start) & (ds.field('ts') < end)
+        )
+    ).sort_by('ts')
+    times = table.column('ts').to_numpy().astype('int64')
+    values = np.column_stack([table.column(column).to_numpy(zero_copy_only=False) for column in MINUTE_BAR_COLUMNS])
+    return times, values.astype('float64').reshape(len(times), len(MINUTE_BAR_COLUMNS))
+
+
+def load_minute_bars(symbol=DEFAULT_SYMBOL, window=MINUTE_WINDOW):
+    '''Latest `window` minute bars of a symbol, oldest first
+
+    All sessions share one buffer per symbol and window. A rerun only reads the bars
+    after the last buffered one, plus the few recent bars ingestion may have revised,
+    and at most once per MINUTE_POLL_SECONDS. The frame is shared as well, and
+    read-only.
+    '''
+    try:
+        buffer = get_minute_buffer(symbol, window)
+        columns = ', '.join(MINUTE_BAR_COLUMNS)
+        with buffer.lock:
+            # sessions polling within MINUTE_POLL_SECONDS of each other share one read
+            if buffer.polled is not None and time.monotonic() - buffer.polled < MINUTE_POLL_SECONDS:
+                return buffer.to_frame()
+
+            with get_database_connection() as conn:
+                last_time = buffer.last_time()
+                if last_time is None:
+                    since = 0
+                    times, values = fetch_minute_rows(
+                        conn,
+                        f'SELECT ts, {columns} FROM minute_bars WHERE symbol = ? ORDER BY ts DESC LIMIT ?',
+                        (symbol, window)
+                    )
+                    times, values = times[::-1], values[::-1]
+                    if len(times) < window:
+                        # older bars were moved to the Parquet archive by the retention job
+                        end = int(times[0]) if len(times) else int(time.time())
+                        missing = window - len(times)
+                        archived_times, archived_values = load_archived_bars(symbol, end - missing * 60, end)
+                        times = np.concatenate([archived_times[-missing:], times])
+                        values = np.concatenate([archived_values[-missing:], values])
+                else:
+                    since = last_time - MINUTE_REFRESH_SECONDS
+                    times, values = fetch_minute_rows(
+                        conn,
+                        f'SELECT ts, {columns} FROM minute_bars WHERE symbol = ? AND ts >= ? ORDER BY ts',
+                        (symbol, since)
+                    )
+            buffer.replace_tail(since, times, values)
+            buffer.polled = time.monotonic()
+            return buffer.to_frame()
+    except Exception as e:
+        st.error(f'Error loading minute data: {e}')
+        raise e
+
+
+def bar_resolution(span):
+    '''Bar size in seconds used for a time span in seconds'''
+    max_bars = CHART_WIDTH_PX * POINTS_PER_PIXEL
+    return next((size for size in BAR_TABLES if span // size <= max_bars), max(BAR_TABLES))
+
+
+def load_rollup_bars(table, symbol, span):
+    '''Bars of a rollup table covering `span` seconds up to the symbol's latest bar,
+    cached until the next ingestion'''
+    cache = get_data_cache()
+    version = cache.get_version(table)
+    key = (symbol, span)
+    df = cache.get(table, version, key)
+    if df is None:
+        columns = ', '.join(MINUTE_BAR_COLUMNS)
         with get_database_connection() as conn:
-            query = '''
-            SELECT Datetime, Open, High, Low, Close, Volume
-            FROM btc_minute
-            ORDER BY Datetime DESC
-            LIMIT 300            
-            '''
-            df = pd.read_sql_query(query, conn)
-            #conn.close()
-            df['Datetime'] = pd.to_datetime(df['Datetime'])
-            df.set_index('Datetime', inplace=True)
+            df = pd.read_sql_query(
+                f'''
+                SELECT ts AS Datetime, {columns} FROM {table}
+                WHERE symbol = ? AND ts > (SELECT MAX(ts) FROM {table} WHERE symbol = ?) - ?
+                ORDER BY ts
+                ''',
+                conn,
+                params=(symbol, symbol, span)
+            )
+        df['Datetime'] = to_datetime(df['Datetime'], unit='s')
+        df.set_index('Datetime', inplace=True)
+        df = cache.put(table, version, key, df)
+    return df
+
+
+def load_bars(symbol=DEFAULT_SYMBOL, span=MINUTE_SPANS[DEFAULT_MINUTE_SPAN]):
+    '''Bars of a symbol covering `span` seconds, at the resolution picked by bar_resolution
+
+    Minute bars come from the live ring buffer, longer spans from the rollup tables
+    ingestion maintains. The frame shares its data with other sessions and is read-only.
+    '''
+    size = bar_resolution(span)
+    if size == 60:
+        with timed('load', BAR_TABLES[size]):
+            df = load_minute_bars(symbol, span // size)
+        # the buffer holds span // 60 bars, which reach further back than `span` where
+        # the symbol has gaps, so keep the same time window as the rollup tables
+        if len(df):
+            df = df.iloc[df.index.searchsorted(df.index[-1] - pd.Timedelta(seconds=span), 'right'):]
         return df
+    try:
+        with timed('load', BAR_TABLES[size]):
+            return load_rollup_bars(BAR_TABLES[size], symbol, span)
     except Exception as e:
-        st.error(f'Error loading BTC data: {e}')
+        st.error(f'Error loading minute data: {e}')
         raise e
+
+
+def load_minute_symbols():
+    '''Symbols with minute bars, cached until new bars are ingested'''
+    cache = get_data_cache()
+    version = cache.get_version('minute_bars')
+    symbols = cache.get('minute_bars', version, 'symbols')
+    if symbols is None:
+        with get_database_connection() as conn:
+            symbols = [row[0] for row in conn.execute('SELECT DISTINCT symbol FROM minute_bars ORDER BY symbol')]
+        cache.put('minute_bars', version, 'symbols', symbols)
+    return symbols
     
 
 def get_file_update_time(filepath):
@@ -69,27 +1017,235 @@ def get_file_update_time(filepath):
         return 'File not found'
     
 
-def get_recent_logs():
+def tail_lines(path, count, block_size=LOG_TAIL_BLOCK):
+    '''Last `count` lines of a file, reading blocks backwards from its end until they
+    hold enough lines, so the cost doesn't grow with the file'''
+    with open(path, 'rb') as f:
+        position = f.seek(0, os.SEEK_END)
+        data = b''
+        while position > 0 and data.count(b'\n') <= count:
+            size = min(block_size, position)
+            position -= size
+            f.seek(position)
+            data = f.read(size) + data
+    return data.decode(errors='replace').splitlines(keepends=True)[-count:]
+
+
+def get_recent_logs(count=10):
     try:
-        with open('/var/log/cron.log', 'r') as f:
-            logs = f.readlines()
-            return logs[-10:] if logs else ['No logs available.']
-    except:
+        logs = tail_lines(LOG_PATH, count)
+        return logs if logs else ['No logs available.']
+    except OSError:
         return ['Log file not accessible.']
 
 
-def create_figure(traces):
+def load_ingestion_runs(job=None, limit=10):
+    '''Latest recorded ingestion runs, newest first, of one job or of all jobs
+
+    Runs of one job are read through the (job, started_at) index, runs of all jobs
+    newest id first. Cached until a job records a new run.
+    '''
+    cache = get_data_cache()
+    version = cache.get_version('ingestion_runs')
+    key = (job, limit)
+    df = cache.get('ingestion_runs', version, key)
+    if df is None:
+        where, order, params = ('WHERE job = ?', 'started_at', (job, limit)) if job else ('', 'id', (limit,))
+        query = f'''
+            SELECT job, started_at, finished_at, duration_ms, rows_fetched, rows_written, error
+            FROM ingestion_runs {where} ORDER BY {order} DESC LIMIT ?
+        '''
+        with get_database_connection() as conn:
+            try:
+                df = pd.read_sql_query(query, conn, params=params)
+            except pd.errors.DatabaseError:
+                # no job has recorded a run yet
+                return pd.DataFrame(columns=['job', 'started_at', 'finished_at', 'duration_ms', 'rows_fetched', 'rows_written', 'error'])
+        df['started_at'] = to_datetime(df['started_at'], unit='s')
+        df['finished_at'] = to_datetime(df['finished_at'], unit='s')
+        df = cache.put('ingestion_runs', version, key, df)
+    return df
+
+
+def ingestion_panel():
+    '''Sidebar expander with the latest run of every ingestion job and the log tail'''
+    with st.expander('Data updates'):
+        runs = [runs for runs in (load_ingestion_runs(job, 1) for job in INGESTION_JOBS) if not runs.empty]
+        if not runs:
+            st.caption('No ingestion runs recorded yet')
+        else:
+            st.dataframe(
+                pd.concat(runs, ignore_index=True)[['job', 'finished_at', 'duration_ms', 'rows_written', 'error']],
+                hide_index=True,
+                use_container_width=True
+            )
+        st.code(''.join(get_recent_logs()), language=None)
+
+
+def lttb_indices(x, y, threshold):
+    '''Positions of the points kept by Largest-Triangle-Three-Buckets downsampling
+
+    The first and last points are always kept. The points in between are split into
+    threshold - 2 buckets and from each bucket the point forming the largest triangle
+    with the previously kept point and the average of the next bucket is chosen.
+    '''
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    # average of every bucket, the last point being the bucket after the last one
+    starts = np.append(edges[:-1], n - 1)
+    counts = np.diff(np.append(starts, n))
+    avg_x = np.add.reduceat(x, starts) / counts
+    avg_y = np.add.reduceat(y, starts) / counts
+
+    kept = np.empty(threshold, dtype=np.int64)
+    kept[0], kept[-1] = 0, n - 1
+    a = 0
+    for i in range(threshold - 2):
+        lo, hi = edges[i], edges[i + 1]
+        area = np.abs(
+            (x[a] - avg_x[i + 1]) * (y[lo:hi] - y[a])
+            - (x[a] - x[lo:hi]) * (avg_y[i + 1] - y[a])
+        )
+        a = lo + int(area.argmax())
+        kept[i + 1] = a
+    return kept
+
+
+@st.cache_data(max_entries=512, show_spinner=False)
+def downsample(series, max_points):
+    '''Reduce a series to at most max_points with LTTB, keeping its visual shape'''
+    if len(series) <= max_points:
+        return series
+    series = series.dropna()
+    if len(series) <= max_points:
+        return series
+    index = series.index
+    x = index.asi8 if isinstance(index, pd.DatetimeIndex) else index.to_numpy()
+    keep = lttb_indices(x.astype('float64'), series.to_numpy(dtype='float64'), max_points)
+    return series.iloc[keep]
+
+
+class CachedFigure(go.Figure):
+    '''Figure backed by an already serialized spec
+
+    st.plotly_chart only calls to_dict() on a figure, which here returns the cached spec
+    instead of validating and encoding every trace again. Changes made through the
+    go.Figure API are not reflected in the spec, so pass the layout to create_figure.
+    '''
+
+    def __init__(self, spec):
+        super().__init__()
+        self._spec = spec
+
+    def to_dict(self):
+        return self._spec
+
+
+@st.cache_resource(show_spinner=False)
+def get_figure_cache():
+    return LRUCache(maxsize=FIGURE_CACHE_SIZE), threading.Lock()
+
+
+def figure_key(traces, *options):
+    '''Digest of the data and spec of every trace plus the figure options'''
+    digest = hashlib.md5()
+    for trace in traces:
+        series = trace['data'][trace['column']]
+        digest.update(series.index.to_numpy().tobytes())
+        digest.update(series.to_numpy().tobytes())
+        spec = {key: value for key, value in trace.items() if key != 'data'}
+        digest.update(json.dumps(spec, sort_keys=True, default=str).encode())
+    digest.update(json.dumps(options, sort_keys=True, default=str).encode())
+    return digest.hexdigest()
+
+
+def build_figure(traces, layout, downsample_points, width, render_mode):
+    fig = go.Figure()
+    max_points = width * POINTS_PER_PIXEL
+    series = []
+    for trace in traces:
+        # frames from load_series hold NaN wherever another series has an observation
+        y = trace['data'][trace['column']].dropna()
+        if downsample_points and trace.get('type', 'scatter') == 'scatter':
+            y = downsample(y, max_points)
+        series.append(y)
+
+    total_points = sum(len(y) for y in series)
+    use_webgl = render_mode == 'webgl' or (render_mode == 'auto' and total_points > WEBGL_POINT_THRESHOLD)
+
+    for trace, y in zip(traces, series):
+        if trace.get('type', 'scatter') == 'bar':
+            fig.add_trace(go.Bar(x=y.index, y=y, name=trace['name'], marker=trace.get('marker')))
+            continue
+        scatter = go.Scattergl if use_webgl else go.Scatter
+        fig.add_trace(scatter(
+            x=y.index,
+            y=y,
+            name=trace['name'],
+            line=trace['line']
+        ))
+    if layout is not None:
+        fig.update_layout(layout)
+    return fig
+
+
+def load_figure_spec(key):
+    '''Figure spec from the persistent cache, figures are keyed by content so they never go stale'''
+    backend = get_data_cache().backend
+    try:
+        value = backend.get_blob('figures', 0, key) if backend is not None else None
+    except Exception:
+        return None
+    return None if value is None else json.loads(value)
+
+
+def store_figure_spec(key, spec):
+    backend = get_data_cache().backend
+    try:
+        if backend is not None:
+            backend.put_blob('figures', 0, key, json.dumps(spec).encode())
+    except Exception:
+        pass
+
+
+def chart_name(traces, layout):
+    '''Title of a chart for its timer, the trace names if it has none'''
+    title = (layout or {}).get('title')
+    title = title.get('text') if isinstance(title, dict) else title
+    return title or ', '.join(str(trace.get('name')) for trace in traces)
+
+
+def create_figure(traces, layout=None, downsample_points=True, width=CHART_WIDTH_PX, render_mode='auto'):
+    '''Build a chart from trace specs, served from the figure cache (in memory, then the
+    persistent cache) when the data and specs are unchanged
+
+    Line traces are capped at about POINTS_PER_PIXEL points per pixel of `width` when
+    downsample_points is set. render_mode is 'svg', 'webgl' or 'auto', which switches to
+    WebGL above WEBGL_POINT_THRESHOLD points.
+    '''
     try: 
-        fig = go.Figure()
-        for trace in traces:
-            
-            fig.add_trace(go.Scatter(
-                x=trace['data'].index,
-                y=trace['data'][trace['column']],
-                name=trace['name'],
-                line=trace['line']
-            ))
-        return fig
+        with timed('chart', chart_name(traces, layout)):
+            cache, lock = get_figure_cache()
+            key = figure_key(traces, layout, downsample_points, width, render_mode)
+            with lock:
+                spec = cache.get(key)
+            if spec is None:
+                spec = load_figure_spec(key)
+                if spec is None:
+                    fig = build_figure(traces, layout, downsample_points, width, render_mode)
+                    spec = json.loads(pio.to_json(fig, validate=False))
+                    store_figure_spec(key, spec)
+                    get_metrics().count('figure_builds')
+                else:
+                    get_metrics().count('figure_persistent_hits')
+                with lock:
+                    cache[key] = spec
+            else:
+                get_metrics().count('figure_memory_hits')
+            return CachedFigure(spec)
     except Exception as e:
         st.error(f'Error create figure: {e}')
         raise e